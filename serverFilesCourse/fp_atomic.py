@@ -0,0 +1,45 @@
+"""
+Replaces files atomically: the new contents go to a temporary file beside
+the target, which is moved over it with os.replace once complete, so readers
+see the old file or the new one and never a partial write. Temporary names
+come from tempfile.mkstemp, so writers of the same file at once (eg grading
+workers building the same pool) can't clobber each other's.
+
+    with atomic_write(path) as f:
+        json.dump(data, f)
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields an unused temporary path beside `path` for the block to create
+    (eg with os.link), which then replaces `path`. It is removed instead if
+    the block raises.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    os.close(fd)
+    # left for the block to create, as os.link won't replace a file
+    os.unlink(tmp)
+    try:
+        yield Path(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    """Like open(path, mode), but `path` is only replaced once the block
+    finishes without raising
+    """
+    with atomic_path(path) as tmp:
+        # "x" fails rather than write through whatever took the name since
+        with open(tmp, mode.replace("w", "x"), **kwargs) as f:
+            yield f
@@ -0,0 +1,172 @@
+"""
+Packs the files a grader needs for one question (server.py, tests/ and res/)
+into a single uncompressed archive that can be mapped into memory, so the
+grader opens one file at startup instead of one per test, answer and resource.
+
+Layout: the magic bytes, the offset and length of the index as two
+little-endian u64s, the members back to back, then the index itself, a JSON
+object mapping each member's path to its [offset, length, size, mtime_ns].
+The size and mtime are those of the file it was packed from, so
+`Bundle.is_fresh` (and tools/bundle.py --check) can tell when a bundle is
+stale.
+
+Graders don't run that check, as statting every member costs more than
+reading the loose files. They only read a bundle that is newer than
+server.py and the bundled directories, whose mtimes change when a member is
+added, removed or replaced, and rely on tools/bundle.py (as run by
+validation_workflow/changed_jobs.py) to rebundle after in-place edits.
+"""
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from fp_atomic import atomic_write
+
+MAGIC = b"FPB1"
+HEADER = struct.Struct("<4sQQ")
+BUNDLE_NAME = "tests/question.fpb"
+# directories whose whole contents are bundled, alongside server.py
+BUNDLED_DIRS = ["tests", "res"]
+
+
+def bundle_members(qdir):
+    """Relative paths of every file in `qdir` that belongs in its bundle"""
+    qdir = Path(qdir)
+    members = ["server.py"] if (qdir / "server.py").is_file() else []
+    for folder in BUNDLED_DIRS:
+        for path in sorted((qdir / folder).rglob("*")):
+            rel = path.relative_to(qdir).as_posix()
+            if path.is_file() and rel != BUNDLE_NAME and "__pycache__" not in rel:
+                members.append(rel)
+    return members
+
+
+def write_bundle(qdir, members=None):
+    """(Re)writes the bundle of `qdir` and returns its path"""
+    qdir = Path(qdir)
+    out = qdir / BUNDLE_NAME
+    if members is None:
+        members = bundle_members(qdir)
+    index = {}
+    with atomic_write(out, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        for rel in members:
+            stat = (qdir / rel).stat()
+            data = (qdir / rel).read_bytes()
+            index[rel] = [f.tell(), len(data), stat.st_size, stat.st_mtime_ns]
+            f.write(data)
+        index_offset = f.tell()
+        encoded = json.dumps(index, separators=(",", ":")).encode()
+        f.write(encoded)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, index_offset, len(encoded)))
+    # after replacing it, which touched tests/, so it's newer than tests/
+    os.utime(out)
+    return out
+
+
+def sources_mtime(qdir):
+    """The newest mtime of server.py and the bundled directories of `qdir`,
+    or 0 when it has none of them
+    """
+    mtimes = [0]
+    for rel in ["server.py", *BUNDLED_DIRS]:
+        try:
+            mtimes.append((Path(qdir) / rel).stat().st_mtime_ns)
+        except FileNotFoundError:
+            pass
+    return max(mtimes)
+
+
+class Bundle:
+    """A read-only, memory-mapped view of a bundle. Members come back as
+    memoryviews over the mapping, which must be released before closing.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, offset, length = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a question bundle")
+        self.index = json.loads(self._map[offset : offset + length])
+
+    def __contains__(self, rel):
+        return rel in self.index
+
+    def names(self):
+        return list(self.index)
+
+    def read(self, rel):
+        offset, length = self.index[rel][:2]
+        return memoryview(self._map)[offset : offset + length]
+
+    def is_fresh(self, qdir):
+        """Whether the bundle still matches the files of `qdir`. Members
+        missing from `qdir` are fine, as bundles can be shipped alone.
+        """
+        qdir = Path(qdir)
+        for rel, entry in self.index.items():
+            if len(entry) < 4:  # packed before bundles recorded stats
+                return False
+            try:
+                stat = (qdir / rel).stat()
+            except FileNotFoundError:
+                continue
+            if [stat.st_size, stat.st_mtime_ns] != entry[2:4]:
+                return False
+        return all(rel in self.index for rel in bundle_members(qdir))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class QuestionFiles:
+    """Reads a question's files from its bundle when it has one newer than
+    its sources, or straight from the question directory otherwise
+    """
+
+    def __init__(self, qdir):
+        self.qdir = Path(qdir)
+        bundle = self.qdir / BUNDLE_NAME
+        try:
+            mtime = bundle.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        self.bundle = None
+        if mtime is not None and mtime >= sources_mtime(self.qdir):
+            self.bundle = Bundle(bundle)
+
+    def exists(self, rel):
+        if self.bundle is not None:
+            return rel in self.bundle
+        return (self.qdir / rel).is_file()
+
+    def read_bytes(self, rel):
+        """The contents of `rel`, zero-copy when it comes from the bundle"""
+        if self.bundle is not None:
+            return self.bundle.read(rel)
+        return (self.qdir / rel).read_bytes()
+
+    def read_text(self, rel):
+        return str(self.read_bytes(rel), "utf-8")
+
+    def members(self):
+        """Relative paths of the question's bundled files"""
+        if self.bundle is not None:
+            return sorted(self.bundle.index)
+        return bundle_members(self.qdir)
+
+    def close(self):
+        if self.bundle is not None:
+            self.bundle.close()
@@ -0,0 +1,159 @@
+"""
+A compact binary encoding of Faded Parsons submissions. A submission is
+stored as the line bank ids of its lines, their indents and what was written
+in the blanks, rather than as the assembled source, and decodes back to the
+exact source text. Lines that aren't from the line bank as given (a comment,
+odd spacing, a tab) are kept as text, so every source round-trips.
+
+All integers are unsigned LEB128 varints. One submission is laid out as:
+    line count
+    line refs   per line, 1 + its line bank id, or 0 for a line kept as text
+    indents     two lines a byte, low nibble first, in levels of 4 spaces
+    strings     per line, its text when kept as text, else its blank fills
+Strings are interned: a string is written as its index in the table of
+strings written so far, and a new string as the table's size followed by its
+UTF-8 length and bytes. Submissions encoded with one Strings table decode in
+the same order with another, so a log of submissions repeats no fill twice.
+"""
+import hashlib
+
+from fp_lines import BLANK, LineMatcher
+
+INDENT = " " * 4
+MAX_INDENT = 15  # what fits in a nibble
+
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    """Returns (n, position after it)"""
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+class Strings:
+    """A table of interned strings"""
+
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def write(self, out, string):
+        i = self.index.get(string)
+        if i is not None:
+            write_varint(out, i)
+            return
+        i = self.index[string] = len(self.strings)
+        self.strings.append(string)
+        raw = string.encode()
+        write_varint(out, i)
+        write_varint(out, len(raw))
+        out += raw
+
+    def read(self, data, pos):
+        i, pos = read_varint(data, pos)
+        if i < len(self.strings):
+            return self.strings[i], pos
+        if i > len(self.strings):
+            raise ValueError(f"string {i} read before string {len(self.strings)}")
+        n, pos = read_varint(data, pos)
+        string = str(data[pos : pos + n], "utf-8")
+        self.index[string] = i
+        self.strings.append(string)
+        return string, pos + n
+
+
+class LineBank:
+    """Encodes and decodes the submissions of one question, given the code
+    of its line bank lines with blanks as !BLANK
+    """
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+        self.parts = [code.split(BLANK) for code in self.codes]
+        self.matcher = LineMatcher(self.codes)
+        # submissions only decode against the bank they were encoded with
+        self.digest = hashlib.sha256("\n".join(self.codes).encode()).digest()[:8]
+
+    def match(self, code):
+        """Returns (line id, fills) of a line's code, or (None, ())"""
+        return next(self.matcher.candidates(code), (None, ()))
+
+    def line(self, id, fills):
+        parts = self.parts[id]
+        pieces = [parts[0]]
+        for fill, part in zip(fills, parts[1:]):
+            pieces += [fill, part]
+        return "".join(pieces)
+
+    def encode(self, source, strings=None, out=None):
+        """Appends the encoding of `source` to `out` and returns it"""
+        strings = Strings() if strings is None else strings
+        out = bytearray() if out is None else out
+        refs, indents, texts = [], [], []
+        for line in source.split("\n"):
+            code = line.lstrip(" ")
+            width = len(line) - len(code)
+            if width % len(INDENT) or width > MAX_INDENT * len(INDENT):
+                code, width = line, 0
+            id, fills = self.match(code)
+            refs.append(0 if id is None else id + 1)
+            indents.append(width // len(INDENT))
+            texts.append([code] if id is None else fills)
+
+        write_varint(out, len(refs))
+        for ref in refs:
+            write_varint(out, ref)
+        indents.append(0)
+        for i in range(0, len(refs), 2):
+            out.append(indents[i] | indents[i + 1] << 4)
+        for line_texts in texts:
+            for text in line_texts:
+                strings.write(out, text)
+        return out
+
+    def decode(self, data, pos=0, strings=None):
+        """Returns (source, position after it) for the submission encoded
+        at `pos` in `data`
+        """
+        strings = Strings() if strings is None else strings
+        count, pos = read_varint(data, pos)
+        refs = []
+        for _ in range(count):
+            ref, pos = read_varint(data, pos)
+            refs.append(ref)
+        packed = data[pos : pos + (count + 1) // 2]
+        pos += len(packed)
+        lines = []
+        for i, ref in enumerate(refs):
+            indent = INDENT * (packed[i // 2] >> 4 * (i % 2) & 0xF)
+            if ref == 0:
+                code, pos = strings.read(data, pos)
+            else:
+                fills = []
+                for _ in range(len(self.parts[ref - 1]) - 1):
+                    fill, pos = strings.read(data, pos)
+                    fills.append(fill)
+                code = self.line(ref - 1, fills)
+            lines.append(indent + code)
+        return "\n".join(lines), pos
+
+
+def encode(codes, source):
+    """One submission's encoding, for a line bank given as code lines"""
+    return bytes(LineBank(codes).encode(source))
+
+
+def decode(codes, data):
+    return LineBank(codes).decode(data)[0]
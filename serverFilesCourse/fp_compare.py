@@ -0,0 +1,135 @@
+"""
+Compares student return values with reference values the way `==` does, but
+stops at the first difference and reports where it is, eg `[3][1]`, instead
+of rendering both values. The work done is proportional to how far into the
+values the first difference is, not to their size.
+
+Numpy arrays and scalars are compared as the lists and numbers they hold,
+so an array equals a list of the same elements.
+"""
+import reprlib
+
+# characters compared per step when looking for where two strings differ
+FIRST_CHUNK = 64
+MAX_CHUNK = 1 << 16
+
+_repr = reprlib.Repr()
+_repr.maxstring = 40
+_repr.maxother = 40
+
+
+def _equal(data, ref):
+    """Whether data == ref, or None when == gives no truth value, as for
+    containers of numpy arrays
+    """
+    try:
+        return bool(data == ref)
+    except (ValueError, TypeError):
+        return None
+
+
+def _string_difference(data, ref):
+    """The index where two unequal strings first differ"""
+    i, step = 0, FIRST_CHUNK
+    while data[i : i + step] == ref[i : i + step]:
+        i += step
+        step = min(step * 2, MAX_CHUNK)
+    for j, (a, b) in enumerate(zip(data[i : i + step], ref[i : i + step])):
+        if a != b:
+            return i + j
+    return i + min(len(data[i : i + step]), len(ref[i : i + step]))
+
+
+def _difference(data, ref, path):
+    if data is ref:
+        return None
+    if hasattr(ref, "tolist") or hasattr(data, "tolist"):
+        # numpy arrays and scalars, without importing numpy
+        data = data.tolist() if hasattr(data, "tolist") else data
+        ref = ref.tolist() if hasattr(ref, "tolist") else ref
+    if isinstance(ref, (list, tuple)) and type(data) is type(ref):
+        # == stops at the first unequal element without building a path
+        equal = _equal(data, ref)
+        if equal:
+            return None
+        for i, (d, r) in enumerate(zip(data, ref)):
+            found = _difference(d, r, f"{path}[{i}]")
+            if found:
+                return found
+        if len(data) != len(ref):
+            return path, f"has {len(data)} items, expected {len(ref)}"
+        # equal when == couldn't tell, as every element is
+        return None if equal is None else (path, "differs")
+    if isinstance(ref, dict) and isinstance(data, dict):
+        equal = _equal(data, ref)
+        if equal:
+            return None
+        for key, r in ref.items():
+            if key not in data:
+                return f"{path}[{key!r}]", "is missing"
+            found = _difference(data[key], r, f"{path}[{key!r}]")
+            if found:
+                return found
+        for key in data:
+            if key not in ref:
+                return f"{path}[{key!r}]", "is not expected"
+        return None if equal is None else (path, "differs")
+    if isinstance(ref, str) and isinstance(data, str):
+        if data == ref:
+            return None
+        i = _string_difference(data, ref)
+        if i >= min(len(data), len(ref)):
+            return path, f"has length {len(data)}, expected {len(ref)}"
+        return f"{path}[{i}]", f"is {data[i]!r}, expected {ref[i]!r}"
+    if _equal(data, ref):
+        return None
+    return path, f"is {_repr.repr(data)}, expected {_repr.repr(ref)}"
+
+
+def first_difference(data, ref):
+    """Returns (path, message) for the first place `data` differs from
+    `ref`, or None when they are equal. The path is "" for the values
+    themselves.
+    """
+    try:
+        return _difference(data, ref, "")
+    except RecursionError:
+        return "", "is nested too deeply to compare"
+
+
+def describe(name, difference):
+    path, message = difference
+    return f"'{name}'{f' at {path}' if path else ''} {message}"
+
+
+def check_value(name, ref, data, report_success=False, report_failure=True):
+    """Like Feedback.check_scalar for any value: adds where `data` first
+    differs from `ref` to the feedback and returns whether they are equal
+    """
+    from code_feedback import Feedback
+
+    difference = first_difference(data, ref)
+    if difference is None:
+        if report_success:
+            Feedback.add_feedback(f"'{name}' looks good")
+        return True
+    if report_failure:
+        Feedback.add_feedback(describe(name, difference))
+    return False
+
+
+def score_cases(student_fn, ref_fn, *cases):
+    """Like score_cases in the generated tests, but each wrong case's
+    feedback says where its result first differs
+    """
+    from code_feedback import Feedback
+
+    correct = 0
+    for case in cases:
+        user_val = Feedback.call_user(student_fn, *case)
+        fn_name = getattr(student_fn, "__name__", repr(student_fn))
+        name = f"{fn_name}({', '.join(map(_repr.repr, case))})"
+        if check_value(name, ref_fn(*case), user_val):
+            correct += 1
+    # set_score must be in range 0.0 to 1.0
+    Feedback.set_score(correct / len(cases) if cases else 1.0)
@@ -0,0 +1,264 @@
+"""
+Fixtures for test modules that need large reference data, eg numpy arrays of
+hidden inputs, built once per host and shared by every grading worker rather
+than rebuilt by each worker for each job.
+
+Decorate a function in tests/test.py that builds the data:
+
+    from fp_fixtures import fixture
+
+    @fixture
+    def hidden_cases():
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 100, size=(100_000, 10))
+
+and call it in the tests. The first caller on the host builds the data into
+a memory-mapped file (in /dev/shm when there is one), and every process maps
+it read-only. numpy arrays and bytes come back as zero-copy read-only views
+of the mapping; other values are pickled and unpickled once per process.
+
+Fixture files are named by the question's path under questions/ and a hash
+of its tests/*.py, so editing the tests builds new ones. Each process mapping
+a fixture keeps a shared lock on its file, so the kernel counts its users, and
+`prune` removes only the files no process has mapped, along with the lock
+files no build holds. The grading queue and load test prune when they stop.
+
+Sharing relies on those locks, so where there are none (on Windows), each
+process builds its fixtures itself and keeps them in memory, and `prune`
+removes nothing.
+"""
+import functools
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from pathlib import Path
+
+from fp_atomic import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"FPF1"
+HEADER = struct.Struct("<4sI")
+ALIGNMENT = 64  # of the data after the header, for numpy
+SUFFIX = ".fpf"
+DIGEST_CHARS = 16  # of the tests hash, in fixture file names
+DEFAULT_DIR = Path(
+    os.environ.get("FP_FIXTURES_DIR")
+    or (
+        "/dev/shm/fp-fixtures"
+        if os.path.isdir("/dev/shm")
+        else os.path.join(tempfile.gettempdir(), "fp-fixtures")
+    )
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _tests_hash(tests_dir, mtimes):
+    digest = hashlib.sha256()
+    for name, _ in mtimes:
+        with open(os.path.join(tests_dir, name), "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read() + b"\0")
+    return digest.hexdigest()
+
+
+def tests_hash(tests_dir):
+    """A hash of the test sources in `tests_dir`"""
+    try:
+        mtimes = tuple(
+            sorted(
+                (entry.name, entry.stat().st_mtime_ns)
+                for entry in os.scandir(tests_dir)
+                if entry.name.endswith(".py") and entry.is_file()
+            )
+        )
+    except OSError:
+        return None
+    return _tests_hash(str(tests_dir), mtimes)
+
+
+def _lock(fd, shared):
+    """Blocks until this process holds a lock on `fd`"""
+    fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+
+def serialize(value):
+    """Returns (header, data) for a fixture's value"""
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        value = numpy.ascontiguousarray(value)
+        if not value.dtype.hasobject and value.dtype.fields is None:
+            header = {"kind": "array", "dtype": value.dtype.str, "shape": value.shape}
+            return header, memoryview(value).cast("B")
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"kind": "bytes"}, memoryview(value).cast("B")
+    return {"kind": "pickle"}, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def write_fixture(path, value):
+    """Writes `value` to the fixture file `path`, atomically"""
+    header, data = serialize(value)
+    encoded = json.dumps(header).encode()
+    start = HEADER.size + len(encoded)
+    padding = -start % ALIGNMENT
+    with atomic_write(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(encoded) + padding))
+        f.write(encoded + b" " * padding)
+        f.write(data)
+
+
+def read_fixture(path):
+    """Maps the fixture file `path` read-only and returns its value. The
+    mapping keeps a shared lock on the file for as long as it is open.
+    """
+    with open(path, "rb") as f:
+        _lock(f.fileno(), shared=True)
+        # the mapping holds its own handle on the file, and so the lock
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, length = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a fixture")
+    header = json.loads(mapped[HEADER.size : HEADER.size + length])
+    start = HEADER.size + length
+    if header["kind"] == "array":
+        if numpy is None:
+            raise ImportError(f"numpy is needed to read the fixture {path}")
+        dtype = numpy.dtype(header["dtype"])
+        count = (len(mapped) - start) // dtype.itemsize
+        array = numpy.frombuffer(mapped, dtype, count, start)
+        return array.reshape(header["shape"])
+    if header["kind"] == "bytes":
+        return memoryview(mapped)[start:]
+    return pickle.loads(memoryview(mapped)[start:])
+
+
+def remove_unheld(paths):
+    """Removes the fixture (or lock) files in `paths` that no process
+    holds, and returns how many were removed. Without locks there is no
+    telling, so nothing is removed.
+    """
+    if fcntl is None:
+        return 0
+    removed = 0
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.unlink(path)
+            removed += 1
+        except OSError:  # held, or removed by another process
+            continue
+    return removed
+
+
+def prune(directory=DEFAULT_DIR):
+    """Removes every fixture file no process holds and every lock file no
+    build holds, and returns how many files were removed
+    """
+    directory = Path(directory)
+    removed = remove_unheld(directory.glob(f"*{SUFFIX}"))
+    return removed + remove_unheld(directory.glob(".*.lock"))
+
+
+def fixture_name(tests_dir, qualname):
+    """Eg "lists~sublist-hidden_cases" for questions/lists/sublist/tests/,
+    as test modules aren't imported by name. Outside a course checkout (eg
+    in a grading container, which holds one question), the name is that of
+    the question's directory.
+    """
+    qdir = Path(tests_dir).parent
+    for parent in qdir.parents:
+        if parent.name == "questions":
+            return f"{'~'.join(qdir.relative_to(parent).parts)}-{qualname}"
+    return f"{qdir.name}-{qualname}"
+
+
+# fixture name -> (path, value, tests directory) of the fixtures this
+# process holds
+_held = {}
+
+
+class Fixture:
+    """A named fixture, built by calling `build` at most once per host for
+    each version of the question's tests
+    """
+
+    def __init__(self, build, name=None, directory=None):
+        self.build = build
+        self.directory = Path(directory or DEFAULT_DIR)
+        tests_dir = Path(build.__code__.co_filename).resolve().parent
+        self.name = name or fixture_name(tests_dir, build.__qualname__)
+        self.tests_dir = tests_dir
+        functools.update_wrapper(self, build)
+
+    def path(self):
+        digest = tests_hash(self.tests_dir)
+        if digest is None:
+            # no test sources on disk (eg read from a bundle), so key the
+            # fixture by the builder's own code instead
+            code = self.build.__code__
+            digest = hashlib.sha256(code.co_code + repr(code.co_consts).encode())
+            digest = digest.hexdigest()
+        return self.directory / f"{self.name}.{digest[:DIGEST_CHARS]}{SUFFIX}"
+
+    def __call__(self):
+        path = self.path()
+        held = _held.get(self.name)
+        if held is not None and held[0] == path:
+            return held[1]
+        value = self._attach(path)
+        # dropping an older version lets its mapping close once unused
+        _held[self.name] = path, value, self.tests_dir
+        return value
+
+    def _attach(self, path):
+        if fcntl is None:
+            # nothing would keep another process from removing the file
+            return self.build()
+        try:
+            return read_fixture(path)
+        except FileNotFoundError:
+            pass
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock = self.directory / f".{self.name}.lock"
+        with open(lock, "a") as f:
+            _lock(f.fileno(), shared=False)
+            # another process may have built it while this one waited
+            if not path.exists():
+                write_fixture(path, self.build())
+                # versions built from older tests
+                versions = f"{self.name}.{'?' * DIGEST_CHARS}{SUFFIX}"
+                stale = self.directory.glob(versions)
+                remove_unheld(p for p in stale if p != path)
+        return read_fixture(path)
+
+    def release(self):
+        """Lets this process's mapping of the fixture close once unused"""
+        _held.pop(self.name, None)
+
+
+def release_question(qdir):
+    """Releases every fixture of the question in `qdir`, eg when a grading
+    worker stops keeping the question
+    """
+    tests_dir = (Path(qdir) / "tests").resolve()
+    for name, held in list(_held.items()):
+        if held[2] == tests_dir:
+            del _held[name]
+
+
+def fixture(build=None, *, name=None, directory=None):
+    """Decorates a function that builds a fixture's value"""
+    if build is None:
+        return functools.partial(fixture, name=name, directory=directory)
+    return Fixture(build, name, directory)
@@ -0,0 +1,144 @@
+"""
+Looks up instructor hints for common mistakes in a submission before it is
+graded, from the index tools/hint_index.py writes to a question's
+tests/hint_index.json.
+
+A submission is matched against the question's line bank and described by
+patterns, each of which may have a hint:
+    source <hash>       the whole submission, ignoring comments and layout
+    fill <blank> <code> what was written in a blank, numbered in bank order
+    order <a> <b>       line a placed directly before line b, though b
+                        comes first in the reference
+    indent <line> <n>   a line indented n levels, where the reference differs
+"""
+import ast
+import functools
+import hashlib
+import json
+from pathlib import Path
+
+from fp_lines import BLANK, LineMatcher, split_comment
+
+INDEX_FILE = "tests/hint_index.json"
+INDENT_WIDTH = 4
+DEFAULT_LIMIT = 3
+# more specific patterns' hints come first
+PRIORITY = {"source": 0, "fill": 1, "order": 2, "indent": 3}
+
+
+def normalize(code):
+    return " ".join(code.split())
+
+
+def source_hash(source):
+    """Hash of a submission that ignores its comments and layout"""
+    try:
+        canonical = ast.unparse(ast.parse(source))
+    except SyntaxError:
+        canonical = "\n".join(
+            normalize(split_comment(line)[0]) for line in source.splitlines()
+        )
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class HintIndex:
+    """The line bank of one question and the hints for its patterns"""
+
+    def __init__(self, lines, hints, patterns):
+        # [code, indent] of each line in reference order
+        self.lines = lines
+        self.hints = hints
+        # pattern -> [index into hints, times seen]
+        self.patterns = patterns
+        self.matcher = LineMatcher(normalize(code) for code, _ in lines)
+        # line id -> number of its first blank, for the lines with blanks
+        self.blanks = {}
+        blank = 0
+        for id, (code, _) in enumerate(lines):
+            if BLANK in code:
+                self.blanks[id] = blank
+                blank += code.count(BLANK)
+
+    def match(self, code, indent):
+        """Returns (line id, first blank number, fills) for a line of code.
+        Of the lines it could be, the one at this indent is preferred.
+        """
+        candidates = list(self.matcher.candidates(code))
+        for id, fills in candidates:
+            if self.lines[id][1] == indent:
+                return id, self.blanks.get(id), fills
+        if not candidates:
+            return None, None, ()
+        id, fills = candidates[0]
+        return id, self.blanks.get(id), fills
+
+    def arrangement(self, source):
+        """Yields (line id, indent, first blank number, fills) per line"""
+        for line in source.splitlines():
+            code = normalize(split_comment(line)[0])
+            if not code:
+                continue
+            indent = (len(line) - len(line.lstrip())) // INDENT_WIDTH
+            id, blank, fills = self.match(code, indent)
+            if id is not None:
+                yield id, indent, blank, fills
+
+    def source_patterns(self, source):
+        yield f"source {source_hash(source)}"
+        previous = None
+        for id, indent, blank, fills in self.arrangement(source):
+            for i, fill in enumerate(fills):
+                yield f"fill {blank + i} {normalize(fill)}"
+            if indent != self.lines[id][1]:
+                yield f"indent {id} {indent}"
+            if previous is not None and previous > id:
+                yield f"order {previous} {id}"
+            previous = id
+
+    def lookup(self, source, limit=DEFAULT_LIMIT):
+        """The hints for the patterns of `source`, most specific first"""
+        found = []
+        for pattern in self.source_patterns(source):
+            entry = self.patterns.get(pattern)
+            if entry:
+                kind = pattern.split(" ", 1)[0]
+                found.append((PRIORITY[kind], -entry[1], entry[0]))
+        hints = []
+        for _, _, i in sorted(found):
+            if self.hints[i] not in hints:
+                hints.append(self.hints[i])
+        return hints[:limit]
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {"lines": self.lines, "hints": self.hints, "patterns": self.patterns},
+                f,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            index = json.load(f)
+        return cls(index["lines"], index["hints"], index["patterns"])
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_index(path, mtime):
+    return HintIndex.load(path)
+
+
+def load_index(qdir):
+    """The question's hint index, or None when it has none"""
+    path = Path(qdir) / INDEX_FILE
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _cached_index(str(path), mtime)
+
+
+def hints_for(qdir, source, limit=DEFAULT_LIMIT):
+    index = load_index(qdir)
+    return index.lookup(source, limit) if index else []
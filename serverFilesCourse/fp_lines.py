@@ -0,0 +1,53 @@
+"""
+Line bank lines as the course tools, the hints and the submission codec all
+read them: the code of each line with its blanks as `!BLANK`, matched against
+the lines of a submission.
+"""
+import re
+
+BLANK = "!BLANK"
+
+
+def split_comment(line):
+    """Splits `line` at the `#` that starts its comment, skipping strings"""
+    quote = None
+    for i, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "#":
+            return line[:i].rstrip(), line[i:]
+    return line.rstrip(), ""
+
+
+def template(code):
+    """A matcher for one line bank line, with a group for each blank"""
+    return re.compile("(.*?)".join(map(re.escape, code.split(BLANK))))
+
+
+class LineMatcher:
+    """Finds the line bank lines a line of code could be, given the code of
+    each line in bank order
+    """
+
+    def __init__(self, codes):
+        self.exact = {}
+        self.templates = []
+        for id, code in enumerate(codes):
+            if BLANK in code:
+                self.templates.append((id, template(code)))
+            else:
+                self.exact.setdefault(code, []).append(id)
+
+    def candidates(self, code):
+        """Yields (line id, blank fills) for each line `code` could be,
+        lines without blanks first
+        """
+        for id in self.exact.get(code, ()):
+            yield id, ()
+        for id, matcher in self.templates:
+            found = matcher.fullmatch(code)
+            if found:
+                yield id, found.groups()
@@ -0,0 +1,69 @@
+"""
+One server implementation for every Faded Parsons question, in place of a
+generated server.py per question that only differs in its names lists. The
+names come from the question's names.json, which tools/question_names.py
+derives from the setup code and the reference answer.
+
+A question's server.py then only needs:
+
+    from fp_server import generate_for
+
+    generate = generate_for(__file__)
+"""
+import copy
+import functools
+import json
+from pathlib import Path
+
+NAMES_FILE = "names.json"
+# questions whose names stay loaded in a long-lived server process
+CACHE_SIZE = 128
+# the order of each name's fields in names.json
+FIELDS = ("name", "type", "description")
+
+
+def pack(names):
+    """names_for_user or names_from_user dicts as names.json rows"""
+    return [[entry[field] for field in FIELDS] for entry in names]
+
+
+def unpack(rows):
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+def dump_names(path, names_for_user, names_from_user):
+    with open(path, "w") as f:
+        json.dump(
+            {"for_user": pack(names_for_user), "from_user": pack(names_from_user)},
+            f,
+            separators=(",", ":"),
+        )
+        f.write("\n")
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _cached_names(path, mtime):
+    with open(path) as f:
+        names = json.load(f)
+    return unpack(names["for_user"]), unpack(names["from_user"])
+
+
+def load_names(qdir):
+    """(names_for_user, names_from_user) of the question in `qdir`. Entries
+    are shared between calls, so callers must copy before changing them.
+    """
+    path = Path(qdir) / NAMES_FILE
+    return _cached_names(str(path), path.stat().st_mtime_ns)
+
+
+def generate(data, qdir):
+    names_for_user, names_from_user = load_names(qdir)
+    data["params"]["names_for_user"] = copy.deepcopy(names_for_user)
+    data["params"]["names_from_user"] = copy.deepcopy(names_from_user)
+    return data
+
+
+def generate_for(server):
+    """The generate(data) of the question whose server.py is `server`"""
+    qdir = Path(server).resolve().parent
+    return functools.partial(generate, qdir=qdir)
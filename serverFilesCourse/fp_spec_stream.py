@@ -0,0 +1,238 @@
+"""
+Streams declarative test specs (eg questions/sublist_test.json) one case at a
+time instead of loading them whole, so a spec with many thousands of hidden
+cases is graded in memory bounded by one case group.
+
+Two spec shapes are understood:
+    {"functionName": ..., "tests": [{"name": ..., "inputs": ["args", ...]}]}
+    [{"name": ..., "tests": [{"args": "args", "points": 1}, ...]}]
+
+Group keys that come after a group's cases are not seen by its cases.
+"""
+import re
+from json.decoder import JSONDecodeError, scanstring
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+# a run of the characters numbers are made of, which a number must fill
+NUMBER_CHARS = re.compile(r"[-+.eE\d]*")
+LITERALS = {"true": True, "false": False, "null": None}
+# keys of a group that hold its cases
+CASE_KEYS = ("inputs", "tests")
+
+
+class Tokens:
+    """JSON tokens read incrementally from a text file. Punctuation comes
+    back as (char, None) and strings, numbers and literals as ("value", v).
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def next(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                break
+            if not self.fill():
+                raise ValueError("Unexpected end of spec")
+        char = self.buf[self.pos]
+        if char in "{}[]:,":
+            self.pos += 1
+            return char, None
+        if char == '"':
+            while True:
+                try:
+                    value, self.pos = scanstring(self.buf, self.pos + 1)
+                    return "value", value
+                except JSONDecodeError:
+                    if not self.fill():
+                        raise
+        if char == "-" or char.isdigit():
+            # a number touching the end of the buffer may continue past it,
+            # eg "1." or "-", so read on until it ends
+            end = NUMBER_CHARS.match(self.buf, self.pos).end()
+            while end == len(self.buf) and self.fill():
+                end = NUMBER_CHARS.match(self.buf, self.pos).end()
+            text = self.buf[self.pos : end]
+            if not NUMBER.fullmatch(text):
+                raise ValueError(f"Unexpected {text!r} in spec")
+            self.pos = end
+            number = float(text) if any(c in text for c in ".eE") else int(text)
+            return "value", number
+        while len(self.buf) - self.pos < 5 and self.fill():
+            pass
+        for literal, value in LITERALS.items():
+            if self.buf.startswith(literal, self.pos):
+                self.pos += len(literal)
+                return "value", value
+        raise ValueError(f"Unexpected {self.buf[self.pos]!r} in spec")
+
+    def expect(self, kind):
+        token = self.next()
+        if token[0] != kind:
+            raise ValueError(f"Expected {kind!r} in spec, found {token[0]!r}")
+        return token
+
+
+def iter_array(tokens):
+    """After a `[`, yields the first token of each element, which the caller
+    must finish reading before advancing
+    """
+    token = tokens.next()
+    if token[0] == "]":
+        return
+    while True:
+        yield token
+        token = tokens.next()
+        if token[0] == "]":
+            return
+        if token[0] != ",":
+            raise ValueError("Expected ',' or ']' in spec")
+        token = tokens.next()
+
+
+def iter_object(tokens):
+    """After a `{`, yields each key, after which the caller must read its
+    value before advancing
+    """
+    token = tokens.next()
+    if token[0] == "}":
+        return
+    while True:
+        kind, key = token
+        if kind != "value" or not isinstance(key, str):
+            raise ValueError("Expected a key in spec")
+        tokens.expect(":")
+        yield key
+        token = tokens.next()
+        if token[0] == "}":
+            return
+        if token[0] != ",":
+            raise ValueError("Expected ',' or '}' in spec")
+        token = tokens.next()
+
+
+def parse_value(tokens, token=None):
+    """Reads one whole value, for the small parts of a spec"""
+    kind, value = token or tokens.next()
+    if kind == "value":
+        return value
+    if kind == "[":
+        return [parse_value(tokens, t) for t in iter_array(tokens)]
+    if kind == "{":
+        return {key: parse_value(tokens) for key in iter_object(tokens)}
+    raise ValueError(f"Unexpected {kind!r} in spec")
+
+
+class Case:
+    """One case of a group: its argument expressions and optional points"""
+
+    def __init__(self, args, points=None):
+        self.args = args
+        self.points = points
+
+    def arguments(self, namespace=None):
+        """Evaluates the case into argument tuples. A case starting with `*`
+        expands to one tuple per item, as in square_color_test.json.
+        """
+        text = self.args.strip()
+        if text.startswith("*"):
+            return [tuple(args) for args in eval(text[1:], namespace or {})]
+        return [eval(f"({text},)", namespace or {})]
+
+
+def as_case(value):
+    if isinstance(value, dict):
+        return Case(value["args"], value.get("points"))
+    return Case(value)
+
+
+def _cases(tokens):
+    tokens.expect("[")
+    for token in iter_array(tokens):
+        yield as_case(parse_value(tokens, token))
+
+
+def _group(tokens, token, spec):
+    if token[0] != "{":
+        raise ValueError("Expected a test group in spec")
+    group = dict(spec)
+    for key in iter_object(tokens):
+        if key in CASE_KEYS:
+            cases = _cases(tokens)
+            yield dict(group), cases
+            for _ in cases:
+                pass
+        else:
+            group[key] = parse_value(tokens)
+
+
+def _groups(tokens):
+    kind, _ = tokens.next()
+    if kind == "[":
+        for token in iter_array(tokens):
+            yield from _group(tokens, token, {})
+        return
+    if kind != "{":
+        raise ValueError("A spec must be an object or an array")
+    spec = {}
+    for key in iter_object(tokens):
+        if key == "tests":
+            tokens.expect("[")
+            for token in iter_array(tokens):
+                yield from _group(tokens, token, spec)
+        else:
+            spec[key] = parse_value(tokens)
+
+
+def iter_groups(path, chunk_size=CHUNK_SIZE):
+    """Yields (group, cases) for each group of the spec at `path`. The
+    group holds the group's keys seen so far along with the spec's own, and
+    `cases` lazily yields its Cases. Like itertools.groupby, the cases must
+    be used before advancing to the next group.
+    """
+    with open(path, encoding="utf-8") as f:
+        for group, cases in _groups(Tokens(f, chunk_size)):
+            yield group, cases
+            for _ in cases:
+                pass
+
+
+def score_streamed_cases(student_fn, ref_fn, path, name, namespace=None):
+    """Like score_cases in the generated tests, but over the group called
+    `name` of the spec at `path`, evaluating cases as they are read. Raises
+    ValueError when the spec has no such group (or names it only after its
+    cases), rather than giving full credit for no cases.
+    """
+    from code_feedback import Feedback
+
+    earned = total = 0.0
+    found = False
+    for group, cases in iter_groups(path):
+        if group.get("name") != name:
+            continue
+        found = True
+        for case in cases:
+            weight = 1.0 if case.points is None else float(case.points)
+            for args in case.arguments(namespace):
+                total += weight
+                user_val = Feedback.call_user(student_fn, *args)
+                if user_val == ref_fn(*args):
+                    earned += weight
+    if not found:
+        raise ValueError(f"{path} has no test group named {name!r}")
+    # set_score must be in range 0.0 to 1.0
+    Feedback.set_score(earned / total if total else 1.0)
@@ -0,0 +1,111 @@
+"""
+Serves a question's variants from a pool generated ahead of time by
+tools/variant_pool.py, instead of running generate(data) on every view.
+
+Decorate the question's generate with `pooled`:
+
+    from fp_variants import pooled
+
+    @pooled
+    def generate(data):
+        ...
+
+PrairieLearn's variant seeds are arbitrary 32-bit numbers, so a seed is mapped
+into the pool by its remainder modulo the pool's size: every seed is served
+the pooled variant of `seed % len(pool)`, as generated for that smaller seed.
+Seeds that aren't ints, and every seed when the question has no pool or
+server.py changed since the pool was built, run generate as usual.
+"""
+import copy
+import functools
+import hashlib
+import inspect
+import json
+from pathlib import Path
+
+from fp_atomic import atomic_write
+
+POOL_NAME = "variant_pool.json"
+
+
+def server_hash(server):
+    with open(server, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class VariantPool:
+    """The generated data of each pooled seed, deduplicated"""
+
+    def __init__(self, server_hash, variants, seeds):
+        self.server_hash = server_hash
+        # distinct {"params": ..., "correct_answers": ...} dicts
+        self.variants = variants
+        # index into `variants` of each pooled seed
+        self.seeds = seeds
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def lookup(self, seed):
+        """The pooled variant `seed` maps to, that of `seed % len(self)`"""
+        return self.variants[self.seeds[seed % len(self.seeds)]]
+
+    def dump(self, path):
+        with atomic_write(path) as f:
+            json.dump(
+                {
+                    "server_hash": self.server_hash,
+                    "variants": self.variants,
+                    "seeds": self.seeds,
+                },
+                f,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            pool = json.load(f)
+        return cls(pool["server_hash"], pool["variants"], pool["seeds"])
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_pool(pool_path, server, server_mtime, pool_mtime):
+    try:
+        pool = VariantPool.load(pool_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if not len(pool) or pool.server_hash != server_hash(server):
+        return None
+    return pool
+
+
+def load_pool(server):
+    """The valid pool next to `server`, or None when there is none"""
+    server = Path(server)
+    pool_path = server.with_name(POOL_NAME)
+    try:
+        server_mtime = server.stat().st_mtime_ns
+        pool_mtime = pool_path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _cached_pool(str(pool_path), str(server), server_mtime, pool_mtime)
+
+
+def pooled(generate):
+    # from the code itself, as server.py may be run without being imported
+    server = inspect.getfile(generate)
+
+    @functools.wraps(generate)
+    def wrapper(data):
+        pool = load_pool(server)
+        seed = data.get("variant_seed")
+        if pool is None or not isinstance(seed, int):
+            return generate(data)
+        variant = copy.deepcopy(pool.lookup(seed))
+        data["params"].update(variant["params"])
+        data.setdefault("correct_answers", {}).update(variant["correct_answers"])
+        return data
+
+    wrapper.live = generate
+    return wrapper
@@ -1,67 +1,180 @@
-import sys
+import csv
+import json
 import os
+import sys
+import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
 
 """
 Run this script with PATH to create all files and subfolders for a new QG.
 Good example of path: python/list-mutation/hard-question
 Bad example of path: python/list mutation/ list: mutation!!
+
+Run it with --manifest FILE to create many questions at once. FILE is either
+a CSV with path, title, topic and tags columns (tags separated by spaces) or
+a JSON list of objects with the same keys.
 """
-def question_template(quid):
-    if os.path.isdir('questions'):
-        os.chdir('questions')
-    else:
-        os.mkdir('questions')
-        os.chdir('questions')
-    for folder in quid:
-        if os.path.isdir(folder):
-            if folder == quid[-1]:
-                print("QUID already exists.")
-                return 0
-            os.chdir(folder)
-        else:
-            os.mkdir(folder)
-            os.chdir(folder)
 
-    server = open('server.py', 'w')
-    question = open('question.html', 'w')
-    info = open('info.json', 'w')
-    readme = open('README.md', 'w')
-    os.mkdir('clientFilesQuestion')
-    os.mkdir('serverFilesQuestion')
+QUESTIONS = "questions"
+DEFAULT_TAGS = ["berkeley"]
 
-    server.write("""import random 
+SERVER = """import random
 def generate(data):
     return data
-    """)
-    question.write("""<pl-question-panel>
+    """
+QUESTION = """<pl-question-panel>
 </pl-question-panel>
-""")
-    new_uuid = str(uuid.uuid1())
-    info.write("""{
-    "uuid": "%s",
-    "title": "",
-    "topic": "",
-    "tags": ["berkeley"],
-    "type": "v3"
-}
-""" % (new_uuid))
-    readme.write("""# Title
+"""
+README = """# Title
 > Description
 ## Table of Contents
 ## Examples
 ## Solutions
 ## Contact <email> or find <name> on Slack for questions
-""")
+"""
+
+
+def write_atomic(path, content):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def existing_uuids(root="."):
+    """Every uuid already used by the course's info files"""
+    patterns = [
+        "infoCourse.json",
+        "courseInstances/**/info*.json",
+        "questions/**/info.json",
+    ]
+    uuids = set()
+    for pattern in patterns:
+        for path in glob(os.path.join(root, pattern), recursive=True):
+            try:
+                with open(path) as f:
+                    uuids.add(json.load(f)["uuid"].lower())
+            except (ValueError, KeyError, TypeError):
+                pass
+    return uuids
+
+
+def fresh_uuid(taken):
+    """A uuid not in `taken`, which is then added to it"""
+    while (new_uuid := str(uuid.uuid4())) in taken:
+        pass
+    taken.add(new_uuid)
+    return new_uuid
+
+
+def question_template(quid, new_uuid, title="", topic="", tags=DEFAULT_TAGS):
+    """Creates the question at questions/QUID. Returns False if it exists."""
+    path = os.path.join(QUESTIONS, *quid)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        return False
+    os.mkdir(os.path.join(path, "clientFilesQuestion"))
+    os.mkdir(os.path.join(path, "serverFilesQuestion"))
+
+    info = {
+        "uuid": new_uuid,
+        "title": title,
+        "topic": topic,
+        "tags": list(tags),
+        "type": "v3",
+    }
+    write_atomic(os.path.join(path, "server.py"), SERVER)
+    write_atomic(os.path.join(path, "question.html"), QUESTION)
+    write_atomic(os.path.join(path, "info.json"), json.dumps(info, indent=4) + "\n")
+    write_atomic(os.path.join(path, "README.md"), README)
+    return True
+
+
+def split_quid(path):
+    """The directories of a QUID, or None unless it is a relative path that
+    stays inside questions/
+    """
+    split_dir = path.split("/")
+    if "" in split_dir or "\\" in path or os.path.isabs(path):
+        return None
+    if any(part in (".", "..") for part in split_dir):
+        return None
+    return split_dir
+
+
+def read_manifest(manifest):
+    """The question entries of a CSV or JSON manifest as dicts"""
+    with open(manifest, newline="") as f:
+        if manifest.endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = list(csv.DictReader(f))
+    for entry in entries:
+        tags = entry.get("tags") or DEFAULT_TAGS
+        if isinstance(tags, str):
+            tags = tags.split()
+        entry["tags"] = tags
+    return entries
+
+
+def bulk_template(entries, workers=8):
+    """Creates every question in `entries` concurrently and returns the
+    paths that were created, skipped because they exist, and invalid
+    """
+    taken = existing_uuids()
+    created, skipped, invalid = [], [], []
+    jobs = []
+    with ThreadPoolExecutor(workers) as pool:
+        for entry in entries:
+            # csv gives None for the columns missing from a short row
+            path = entry.get("path") or ""
+            quid = split_quid(path)
+            if quid is None:
+                invalid.append(path)
+                continue
+            args = (
+                quid,
+                fresh_uuid(taken),
+                entry.get("title") or "",
+                entry.get("topic") or "",
+                entry["tags"],
+            )
+            jobs.append((path, pool.submit(question_template, *args)))
+        for path, job in jobs:
+            (created if job.result() else skipped).append(path)
+    return created, skipped, invalid
+
 
 def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--manifest":
+        created, skipped, invalid = bulk_template(read_manifest(sys.argv[2]))
+        for label, paths in [
+            ("Created", created),
+            ("Skipped (already exists)", skipped),
+            ("Invalid path", invalid),
+        ]:
+            print(f"{label}: {len(paths)}")
+            for path in paths:
+                print(f"  {path}")
+        return
     if len(sys.argv) != 2:
         sys.exit("Please enter one valid path")
-    split_dir = sys.argv[1].split("/")
-    if '' in split_dir:
+    split_dir = split_quid(sys.argv[1])
+    if split_dir is None:
         sys.exit("Not a valid path")
-    if question_template(split_dir) != 0: 
+    if question_template(split_dir, fresh_uuid(existing_uuids())):
         print("Your question's QUID is: " + sys.argv[1])
+    else:
+        print("QUID already exists.")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+COURSE_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(COURSE_ROOT / "tools"))
+sys.path.insert(0, str(COURSE_ROOT / "validation_workflow"))
+
+import fpp_source  # noqa: E402,F401 puts serverFilesCourse on the path
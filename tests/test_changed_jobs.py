@@ -0,0 +1,49 @@
+import pytest
+from changed_jobs import Graph
+
+
+@pytest.fixture
+def course(tmp_path):
+    """A course with a top-level question and a nested one whose source
+    imports a spec from its own directory
+    """
+    files = {
+        "questions/make_four.py": "",
+        "questions/make_four/info.json": "{}",
+        "questions/make_four/tests/test.py": "",
+        "questions/lists/sublist.py": "## import sublist_test.json as test ##\n",
+        "questions/lists/sublist/info.json": "{}",
+        "questions/lists/sublist/tests/test.py": "",
+        "questions/lists/sublist_test.json": "[]",
+        # a top-level file the nested import must not be taken for
+        "questions/sublist_test.json": "[]",
+        "questions/graded/info.json": "{}",
+        "questions/graded_test.json": "[]",
+    }
+    for rel, text in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return Graph(tmp_path)
+
+
+def test_quids_are_nested(course):
+    assert course.quids == ["graded", "lists/sublist", "make_four"]
+
+
+def test_imports_are_relative_to_the_source(course):
+    assert course.importers == {"questions/lists/sublist_test.json": {"lists/sublist"}}
+    assert ("generate", "lists/sublist") not in course.affected(
+        ["questions/sublist_test.json"]
+    )
+
+
+def test_spec_regenerates_and_regrades_its_question(course):
+    affected = course.affected(["questions/lists/sublist_test.json"])
+    assert {("generate", "lists/sublist"), ("grade", "lists/sublist")} <= affected
+    affected = course.affected(["questions/make_four_test.json"])
+    assert {("generate", "make_four"), ("grade", "make_four")} <= affected
+
+
+def test_spec_without_a_source_regrades(course):
+    assert course.affected(["questions/graded_test.json"]) == {("grade", "graded")}
@@ -0,0 +1,31 @@
+import pytest
+from fp_atomic import atomic_write
+
+
+def test_replaces_when_done(tmp_path):
+    path = tmp_path / "pool.json"
+    path.write_text("old")
+    with atomic_write(path) as f:
+        f.write("new")
+        assert path.read_text() == "old"
+    assert path.read_text() == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["pool.json"]
+
+
+def test_keeps_the_old_file_on_error(tmp_path):
+    path = tmp_path / "pool.json"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write("partial")
+            raise RuntimeError
+    assert path.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["pool.json"]
+
+
+def test_concurrent_writers_use_their_own_files(tmp_path):
+    path = tmp_path / "pool.json"
+    with atomic_write(path) as first, atomic_write(path) as second:
+        first.write("first")
+        second.write("second")
+    assert path.read_text() == "first"
@@ -0,0 +1,29 @@
+import os
+import shutil
+
+from fp_bundle import QuestionFiles, write_bundle
+from fpp_source import QUESTIONS_DIR
+
+
+def copy_question(tmp_path):
+    qdir = tmp_path / "make_four"
+    shutil.copytree(QUESTIONS_DIR / "make_four", qdir)
+    return qdir
+
+
+def test_new_bundle_is_read(tmp_path):
+    qdir = copy_question(tmp_path)
+    write_bundle(qdir)
+    files = QuestionFiles(qdir)
+    assert files.bundle is not None
+    files.close()
+
+
+def test_bundle_older_than_its_sources_is_skipped(tmp_path):
+    qdir = copy_question(tmp_path)
+    bundle = write_bundle(qdir)
+    mtime = bundle.stat().st_mtime_ns
+    os.utime(bundle, ns=(mtime - 10**9, mtime - 10**9))
+    files = QuestionFiles(qdir)
+    assert files.bundle is None
+    assert files.exists("tests/ans.py")
@@ -0,0 +1,42 @@
+from fp_compare import first_difference
+
+
+class Array:
+    """Enough of a numpy array: == is elementwise, and its result has no
+    truth value
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+
+    def tolist(self):
+        return list(self.items)
+
+    def __eq__(self, other):
+        return Elementwise()
+
+
+class Elementwise:
+    def __bool__(self):
+        raise ValueError("The truth value of an array is ambiguous")
+
+
+def test_array_equals_list():
+    assert first_difference(Array([1, 2, 3]), [1, 2, 3]) is None
+    assert first_difference([1, 2, 3], Array([1, 2, 3])) is None
+
+
+def test_array_differs_from_list():
+    assert first_difference(Array([1, 5, 3]), [1, 2, 3]) == (
+        "[1]",
+        "is 5, expected 2",
+    )
+
+
+def test_containers_of_arrays():
+    assert first_difference([Array([1]), Array([2])], [[1], [2]]) is None
+    assert first_difference({"a": Array([1])}, {"a": Array([1])}) is None
+    assert first_difference({"a": Array([1])}, {"a": Array([2])}) == (
+        "['a'][0]",
+        "is 1, expected 2",
+    )
@@ -0,0 +1,39 @@
+from fp_codec import LineBank
+from fp_hints import HintIndex
+from fp_lines import LineMatcher, split_comment
+
+BANK = [
+    ["def is_sublist(list, sublist):", 0],
+    ["for i in range(!BLANK):", 1],
+    ["if list[!BLANK] == sublist:", 2],
+    ["return !BLANK", 3],
+    ["return False", 1],
+]
+SOURCE = """def is_sublist(list, sublist):
+    for i in range(n - m): # the last start
+        if list[i:i + m] == sublist:
+            return True
+    return False"""
+
+
+def test_split_comment_skips_strings():
+    assert split_comment("x = '#' + y  # note") == ("x = '#' + y", "# note")
+    assert split_comment('print("a # b")') == ('print("a # b")', "")
+
+
+def test_exact_lines_come_first():
+    matcher = LineMatcher(["return !BLANK", "return False"])
+    assert list(matcher.candidates("return False")) == [(1, ()), (0, ("False",))]
+    assert list(matcher.candidates("pass")) == []
+
+
+def test_codec_round_trips():
+    bank = LineBank(code for code, _ in BANK)
+    assert bank.decode(bank.encode(SOURCE))[0] == SOURCE
+    assert bank.match("return x") == (3, ("x",))
+
+
+def test_hints_number_blanks_in_bank_order():
+    index = HintIndex(BANK, [], {})
+    patterns = set(index.source_patterns(SOURCE.replace("True", "False")))
+    assert {"fill 0 n - m", "fill 1 i:i + m", "fill 2 False"} <= patterns
@@ -0,0 +1,76 @@
+import io
+import json
+
+import pytest
+from fp_spec_stream import Tokens, iter_groups, parse_value, score_streamed_cases
+from fpp_source import QUESTIONS_DIR
+from local_grader import standins
+
+SPECS = sorted(QUESTIONS_DIR.rglob("*_test.json"))
+CHUNK_SIZES = range(1, 17)
+# numbers that split across chunks at the small sizes
+TRICKY = [
+    "[1.5]",
+    '{"a": -3}',
+    '{"a": [-0.25E-3, 1e+10, 0, -0, 12345678901234567890]}',
+    '[true, false, null, "x\\u00e9\\"y", -1.0e-2]',
+]
+
+
+def expected_cases(spec):
+    groups = spec if isinstance(spec, list) else spec["tests"]
+    cases = []
+    for group in groups:
+        for key in ("inputs", "tests"):
+            for case in group.get(key, []):
+                if isinstance(case, dict):
+                    cases.append((group.get("name"), case["args"], case.get("points")))
+                else:
+                    cases.append((group.get("name"), case, None))
+    return cases
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("text", TRICKY)
+def test_tokens_match_json(text, chunk_size):
+    assert parse_value(Tokens(io.StringIO(text), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("path", SPECS, ids=lambda p: p.name)
+def test_specs_match_json(path, chunk_size):
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    with open(path, encoding="utf-8") as f:
+        assert parse_value(Tokens(f, chunk_size)) == spec
+
+    cases = [
+        (group.get("name"), case.args, case.points)
+        for group, group_cases in iter_groups(path, chunk_size)
+        for case in group_cases
+    ]
+    assert cases == expected_cases(spec)
+
+
+@pytest.mark.parametrize("text", ["[1.]", "[1e]", "[-]", "[--1]"])
+def test_bad_numbers(text):
+    with pytest.raises(ValueError):
+        parse_value(Tokens(io.StringIO(text), 1))
+
+
+def double(x):
+    return 2 * x
+
+
+def test_unknown_group_is_an_error(tmp_path):
+    standins()
+    from code_feedback import Feedback
+
+    spec = tmp_path / "double_test.json"
+    spec.write_text('[{"name": "small", "tests": [{"args": "1"}, {"args": "2"}]}]')
+
+    Feedback.reset()
+    score_streamed_cases(double, double, spec, "small")
+    assert Feedback.score == 1.0
+    with pytest.raises(ValueError, match="'large'"):
+        score_streamed_cases(double, double, spec, "large")
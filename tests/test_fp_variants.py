@@ -0,0 +1,30 @@
+from fp_variants import VariantPool, pooled
+
+# a seed of the size PrairieLearn gives variants
+SEED = 3_141_592_653
+
+
+def make_pool(size):
+    variants = [{"params": {"n": i}, "correct_answers": {}} for i in range(size)]
+    return VariantPool("hash", variants, list(range(size)))
+
+
+def test_every_seed_maps_into_the_pool():
+    pool = make_pool(100)
+    assert pool.lookup(SEED) == pool.lookup(53)
+    assert pool.lookup(SEED)["params"] == {"n": 53}
+    assert pool.lookup(-1) == pool.lookup(99)
+
+
+def test_large_seed_is_served_from_the_pool(monkeypatch):
+    pool = make_pool(7)
+    monkeypatch.setattr("fp_variants.load_pool", lambda server: pool)
+    calls = []
+
+    def generate(data):
+        calls.append(data["variant_seed"])
+        return data
+
+    data = pooled(generate)({"params": {}, "variant_seed": SEED})
+    assert not calls
+    assert data["params"] == {"n": SEED % 7}
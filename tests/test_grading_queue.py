@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import grading_queue
+from fpp_source import QUESTIONS_DIR
+from grading_queue import Spool, Submission, serve
+
+QUESTION = "make_four"
+ANSWER = (QUESTIONS_DIR / QUESTION / "tests" / "ans.py").read_text()
+# kills the grading process, which breaks its whole pool
+CRASH = "import os\nos._exit(1)\n"
+# raises SystemExit, which isn't an Exception
+EXIT = "import sys\nsys.exit(0)\n"
+# swallows the worker's own time limit, so only a kill stops it
+HANG = """
+while True:
+    try:
+        while True:
+            pass
+    except BaseException:
+        pass
+"""
+
+
+def grade_all(tmp_path, sources, workers):
+    """Serves the spool until it's empty and returns each status by id"""
+    spool = Spool(tmp_path / "spool")
+    for i, source in enumerate(sources):
+        spool.put(Submission(f"s{i}", QUESTION, source, deadline=i))
+    asyncio.run(serve(spool, workers, once=True))
+    assert not list(spool.claimed.iterdir())
+    assert len(list(spool.done.iterdir())) == len(sources)
+    statuses = {}
+    for path in spool.results.glob("*.json"):
+        with open(path) as f:
+            statuses[path.stem] = json.load(f)["status"]
+    return statuses
+
+
+def test_crash_fails_only_its_submission(tmp_path):
+    statuses = grade_all(tmp_path, [CRASH, ANSWER, ANSWER, ANSWER], workers=2)
+    assert statuses == {"s0": "error", "s1": "ok", "s2": "ok", "s3": "ok"}
+
+
+def test_pool_recovers_after_crashes(tmp_path):
+    sources = [ANSWER, CRASH, ANSWER, CRASH, ANSWER]
+    statuses = grade_all(tmp_path, sources, workers=1)
+    assert statuses == {
+        "s0": "ok",
+        "s1": "error",
+        "s2": "ok",
+        "s3": "error",
+        "s4": "ok",
+    }
+
+
+def test_exit_only_fails_its_submission(tmp_path):
+    statuses = grade_all(tmp_path, [EXIT, ANSWER], workers=1)
+    assert statuses == {"s0": "ok", "s1": "ok"}
+    with open(tmp_path / "spool" / "results" / "s0.json") as f:
+        assert json.load(f)["score"] == 0.0
+
+
+def test_hung_worker_is_killed(tmp_path, monkeypatch):
+    monkeypatch.setattr(grading_queue, "grading_timeout", lambda qdir: 0.5)
+    monkeypatch.setattr(grading_queue, "KILL_GRACE", 0.5)
+    statuses = grade_all(tmp_path, [HANG, ANSWER, ANSWER], workers=2)
+    assert statuses == {"s0": "timeout", "s1": "ok", "s2": "ok"}
@@ -0,0 +1,306 @@
+"""
+Summarizes a term of grading results per question, per test and per blank.
+Results are streamed, so memory grows with the number of questions, tests and
+students rather than with the number of submissions.
+
+Usage: python3 tools/analytics.py [--roster FILE] [--format csv|columns]
+                                  [--out DIR] RESULTS.jsonl [...]
+
+Each result is one JSON object per line with these keys:
+    question      the question's QUID, eg "sublist"
+    user          the student's uin
+    submitted_at  an ISO 8601 timestamp or seconds since the epoch
+    score         the submission's score from 0.0 to 1.0
+    tests         optional, the graded tests as in results.json
+    blanks        optional, the submitted blank fills in line bank order
+"""
+import argparse
+import csv
+import gzip
+import json
+import math
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+from fpp_source import parse_line_bank, source_for
+
+SCORE_BINS = 11  # tenths, with a bin of its own for full credit
+TIME_BINS = 24  # powers of two of seconds, up to ~97 days
+TOP_FILLS = 20  # wrong fills tracked per blank
+
+
+class Summary:
+    """Numeric columns keyed by tuples, one array per column"""
+
+    def __init__(self, key_names, column_names):
+        self.key_names = list(key_names)
+        self.rows = {}
+        self.keys = []
+        self.columns = {name: array("d") for name in column_names}
+
+    def row(self, key):
+        i = self.rows.get(key)
+        if i is None:
+            i = self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            for column in self.columns.values():
+                column.append(0.0)
+        return i
+
+    def add(self, key, **values):
+        i = self.row(key)
+        for name, value in values.items():
+            self.columns[name][i] += value
+
+    def table(self):
+        """Returns (header, columns) with the keys as leading columns"""
+        keys = list(zip(*self.keys)) or [[] for _ in self.key_names]
+        header = self.key_names + list(self.columns)
+        values = [
+            [int(v) if v.is_integer() else v for v in column]
+            for column in self.columns.values()
+        ]
+        return header, [list(k) for k in keys] + values
+
+
+class TopK:
+    """Approximate counts of the most frequent items (space-saving), in
+    memory bounded by `k` however many distinct items are seen
+    """
+
+    def __init__(self, k=TOP_FILLS):
+        self.k = k
+        self.counts = {}
+
+    def add(self, item):
+        if item in self.counts or len(self.counts) < self.k:
+            self.counts[item] = self.counts.get(item, 0) + 1
+        else:
+            smallest = min(self.counts, key=self.counts.get)
+            self.counts[item] = self.counts.pop(smallest) + 1
+
+    def most_common(self):
+        return sorted(self.counts.items(), key=lambda kv: -kv[1])
+
+
+def timestamp(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def normalize_fill(fill):
+    return " ".join(fill.split())
+
+
+def histogram_percentile(histogram, q):
+    """Upper bound of the power of two bin holding the `q` quantile"""
+    total = sum(histogram)
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if total and seen >= q * total:
+            return float(2 ** (i + 1))
+    return math.nan
+
+
+class Analytics:
+    def __init__(self):
+        self.questions = Summary(
+            ["question"],
+            ["submissions", "score_total", "perfect"]
+            + [f"score_bin_{i}" for i in range(SCORE_BINS)],
+        )
+        self.tests = Summary(
+            ["question", "test"], ["runs", "points", "max_points", "passed"]
+        )
+        self.students = Summary(["user"], ["submissions", "score_total", "solved"])
+        self.solve_times = {}  # question -> histogram
+        # (question, user) -> time of the first submission, None once solved
+        self.attempts = {}
+        self.fills = {}  # (question, blank) -> TopK of wrong fills
+        self.references = {}  # question -> reference fills
+
+    def reference_fills(self, question):
+        if question not in self.references:
+            source = source_for(question)
+            bank = parse_line_bank(source) if source.is_file() else []
+            self.references[question] = [
+                normalize_fill(b) for line in bank for b in line.blanks
+            ]
+        return self.references[question]
+
+    def add(self, result):
+        question = str(result["question"])
+        user = str(result.get("user", ""))
+        score = float(result.get("score", 0.0))
+        perfect = score >= 1.0
+        self.questions.add(
+            (question,),
+            submissions=1,
+            score_total=score,
+            perfect=perfect,
+            **{f"score_bin_{min(int(score * 10), SCORE_BINS - 1)}": 1},
+        )
+        self.students.add((user,), submissions=1, score_total=score)
+
+        for test in result.get("tests", []):
+            max_points = float(test.get("max_points", 0))
+            points = float(test.get("points", 0))
+            self.tests.add(
+                (question, test.get("name", "")),
+                runs=1,
+                points=points,
+                max_points=max_points,
+                passed=points >= max_points,
+            )
+
+        reference = self.reference_fills(question)
+        for i, fill in enumerate(result.get("blanks", [])):
+            fill = normalize_fill(fill)
+            if i < len(reference) and fill == reference[i]:
+                continue
+            self.fills.setdefault((question, i), TopK()).add(fill)
+
+        if "submitted_at" in result:
+            self.add_attempt(question, user, timestamp(result["submitted_at"]), perfect)
+
+    def add_attempt(self, question, user, when, perfect):
+        key = (question, user)
+        if key not in self.attempts:
+            self.attempts[key] = when
+        first = self.attempts[key]
+        if perfect and first is not None:
+            self.attempts[key] = None
+            self.students.add((user,), solved=1)
+            histogram = self.solve_times.setdefault(question, [0] * TIME_BINS)
+            seconds = max(when - first, 1.0)
+            histogram[min(int(math.log2(seconds)), TIME_BINS - 1)] += 1
+
+    def question_table(self):
+        header, columns = self.questions.table()
+        questions = columns[0]
+        submissions = columns[header.index("submissions")]
+        totals = columns[header.index("score_total")]
+        header[header.index("score_total")] = "mean_score"
+        columns[header.index("mean_score")] = [
+            t / n if n else 0.0 for t, n in zip(totals, submissions)
+        ]
+        for name, q in [("solve_seconds_p50", 0.5), ("solve_seconds_p90", 0.9)]:
+            header.append(name)
+            columns.append(
+                [
+                    histogram_percentile(self.solve_times.get(question, []), q)
+                    for question in questions
+                ]
+            )
+        return header, columns
+
+    def test_table(self):
+        header, columns = self.tests.table()
+        runs = columns[header.index("runs")]
+        points = columns[header.index("points")]
+        max_points = columns[header.index("max_points")]
+        passed = columns[header.index("passed")]
+        return ["question", "test", "runs", "mean_fraction", "pass_rate"], [
+            columns[0],
+            columns[1],
+            runs,
+            [p / m if m else 1.0 for p, m in zip(points, max_points)],
+            [p / n if n else 0.0 for p, n in zip(passed, runs)],
+        ]
+
+    def blank_table(self):
+        rows = []
+        for (question, blank), top in sorted(self.fills.items()):
+            rows += [(question, blank, fill, n) for fill, n in top.most_common()]
+        return ["question", "blank", "wrong_fill", "count"], [
+            list(c) for c in zip(*rows)
+        ] or [[], [], [], []]
+
+    def student_table(self, roster):
+        _, (users, submissions, totals, solved) = self.students.table()
+        return ["user", "name", "submissions", "mean_score", "solved"], [
+            users,
+            [roster.get(user, "") for user in users],
+            submissions,
+            [t / n if n else 0.0 for t, n in zip(totals, submissions)],
+            solved,
+        ]
+
+
+def read_results(paths):
+    for path in paths:
+        if path == "-":
+            f = sys.stdin
+        elif path.endswith(".gz"):
+            f = gzip.open(path, "rt")
+        else:
+            f = open(path)
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_roster(path):
+    """Indexes a roster shaped like student_names.json by uin"""
+    with open(path) as f:
+        students = json.load(f)
+    return {
+        s["uin"]: s.get("preferred") or f"{s.get('first', '')} {s.get('last', '')}"
+        for s in students
+    }
+
+
+def write_csv(out, name, header, columns):
+    with open(out / f"{name}.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+
+
+def write_columns(out, name, header, columns):
+    """Writes a table as a directory with one file of values per column"""
+    table = out / name
+    table.mkdir(exist_ok=True)
+    schema = []
+    for column_name, values in zip(header, columns):
+        numeric = all(isinstance(v, (int, float)) for v in values)
+        schema.append(
+            {
+                "name": column_name,
+                "type": "number" if numeric else "string",
+                "file": f"{column_name}.txt",
+            }
+        )
+        with open(table / f"{column_name}.txt", "w") as f:
+            for value in values:
+                f.write(json.dumps(value) + "\n")
+    with open(table / "_schema.json", "w") as f:
+        json.dump({"rows": len(columns[0]) if columns else 0, "columns": schema}, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("results", nargs="+", help="Result logs (.jsonl, .gz or -)")
+    parser.add_argument("--roster", help="A roster like student_names.json")
+    parser.add_argument("--format", choices=["csv", "columns"], default="csv")
+    parser.add_argument("--out", default="analytics", help="Output directory")
+
+    args = parser.parse_args()
+    analytics = Analytics()
+    for result in read_results(args.results):
+        analytics.add(result)
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    write = write_csv if args.format == "csv" else write_columns
+    write(out, "questions", *analytics.question_table())
+    write(out, "tests", *analytics.test_table())
+    write(out, "blanks", *analytics.blank_table())
+    if args.roster:
+        write(out, "students", *analytics.student_table(read_roster(args.roster)))
+    print(f"Wrote summaries to {out}")
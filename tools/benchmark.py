@@ -0,0 +1,325 @@
+"""
+Times source parsing and line bank compilation for every question,
+info_json_check.py over synthetic courses, and grading of each question's
+reference answer through the local grader, along with their peak memory.
+
+Results are compared with a stored baseline, and the run fails when any
+benchmark is slower than the baseline by more than the threshold.
+
+Usage: python3 tools/benchmark.py [--baseline FILE] [--save] [--threshold 0.25]
+                                  [--repeat N] [--profile DIR]
+                                  [--sample-profile DIR] [--only PREFIX]
+"""
+import argparse
+import cProfile
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from fpp_source import (
+    COURSE_ROOT,
+    iter_regions,
+    parse_line_bank,
+    question_dirs,
+    question_sources,
+)
+from line_bank_payload import BLOCK, compile_payload
+from local_grader import ANSWER_FILE, Question, grade
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+DEFAULT_BASELINE = COURSE_ROOT / "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+COURSE_SIZES = [100, 1000, 10000]
+VALIDATOR = COURSE_ROOT / "validation_workflow" / "info_json_check.py"
+SAMPLE_INTERVAL = 0.001
+
+
+class SamplingProfiler:
+    """Samples the main thread's stack from a background thread and counts
+    each stack in the collapsed format flame graph tools read
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def parse_sources():
+    for source in question_sources():
+        with open(source, encoding="utf-8") as f:
+            for _, body in iter_regions(f):
+                for _ in body:
+                    pass
+        parse_line_bank(source)
+
+
+def compile_line_banks():
+    for qdir in question_dirs():
+        match = BLOCK.search((qdir / "question.html").read_text())
+        if match:
+            compile_payload(match.group(2))
+
+
+def grade_reference(qdir):
+    def run():
+        grade(Question(qdir), (Path(qdir) / ANSWER_FILE).read_text())
+
+    return run
+
+
+def synthetic_course(root, size):
+    """Writes a course with `size` questions that pass info_json_check.py"""
+    with open(COURSE_ROOT / "infoCourse.json") as f:
+        course = json.load(f)
+    topic = course["topics"][0]["name"]
+    # one of each kind of tag info_json_check.py requires, adding any the
+    # course doesn't define yet
+    tags = []
+    for field in ("assessment", "institution", "author"):
+        names = [tag["name"] for tag in course["tags"] if tag.get(field)]
+        if not names:
+            names = [f"benchmark-{field}"]
+            course["tags"].append({"name": names[0], "color": "gray1", field: True})
+        tags.append(names[0])
+    with open(Path(root) / "infoCourse.json", "w") as f:
+        json.dump(course, f)
+    for i in range(size):
+        qdir = Path(root) / "questions" / f"q{i // 100}" / f"question_{i}"
+        qdir.mkdir(parents=True)
+        info = {
+            "uuid": f"00000000-0000-4000-8000-{i:012d}",
+            "title": f"Question {i}",
+            "topic": topic,
+            "tags": tags,
+            "type": "v3",
+        }
+        (qdir / "info.json").write_text(json.dumps(info))
+
+
+def wait_child(proc):
+    """Waits for the child process `proc` and returns its peak kilobytes,
+    or 0 where that can't be measured
+    """
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        maxrss = usage.ru_maxrss
+    else:
+        proc.wait()
+        if resource is None:
+            return 0
+        # the largest of every child waited for so far, so at least this one's
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and bytes on macos
+    return maxrss // (1024 if sys.platform == "darwin" else 1)
+
+
+def run_validator(course, profile_to=None):
+    """Times info_json_check.py --all in a child process. Returns (seconds,
+    peak kilobytes) of the child, with 0 kilobytes where os.wait4 and the
+    resource module are both missing (eg on windows).
+    """
+    command = [sys.executable]
+    if profile_to:
+        command += ["-m", "cProfile", "-o", str(profile_to)]
+    command += [str(VALIDATOR), "--all"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=course, stdout=subprocess.DEVNULL)
+    peak_kb = wait_child(proc)
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError("info_json_check.py failed on the synthetic course")
+    return seconds, peak_kb
+
+
+def measure(run, profile_to=None, sample_to=None):
+    """Times `run` in this process, profiling it if asked"""
+    profiler = cProfile.Profile() if profile_to else None
+    sampler = SamplingProfiler() if sample_to else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    if sampler:
+        sampler.__enter__()
+    try:
+        run()
+    finally:
+        seconds = time.perf_counter() - start
+        if sampler:
+            sampler.__exit__(None, None, None)
+            sampler.dump(sample_to)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_to)
+    return seconds
+
+
+def peak_memory(run):
+    """Peak kilobytes allocated by Python while `run` runs. Kept apart from
+    the timed runs, which tracing would slow down.
+    """
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def benchmarks():
+    """(name, run) pairs for in-process benchmarks"""
+    yield "generate/parse_sources", parse_sources
+    yield "generate/line_bank_payloads", compile_line_banks
+    for qdir in question_dirs():
+        yield f"grade/{os.path.relpath(qdir, COURSE_ROOT / 'questions')}", (
+            grade_reference(qdir)
+        )
+
+
+def output(directory, name, suffix):
+    """Where a benchmark's profile goes, or None without a directory"""
+    if directory:
+        return Path(directory) / (re.sub(r"[^\w.-]+", "_", name) + suffix)
+    return None
+
+
+def run_all(repeat, only=None, profile_dir=None, sample_dir=None):
+    results = {}
+
+    def keep(name, samples):
+        results[name] = {
+            "seconds": min(s for s, _ in samples),
+            "peak_kb": max(kb for _, kb in samples),
+        }
+        print(
+            f"{name:40} {results[name]['seconds'] * 1000:10.2f} ms "
+            f"{results[name]['peak_kb']:10d} KB"
+        )
+
+    for name, run in benchmarks():
+        if only and not name.startswith(only):
+            continue
+        samples = []
+        try:
+            for i in range(repeat):
+                last = i == repeat - 1
+                seconds = measure(
+                    run,
+                    last and output(profile_dir, name, ".prof"),
+                    last and output(sample_dir, name, ".txt"),
+                )
+                samples.append((seconds, peak_memory(run) if last else 0))
+        except Exception as e:
+            print(f"{name:40} skipped: {type(e).__name__}: {e}")
+            continue
+        keep(name, samples)
+
+    for size in COURSE_SIZES:
+        name = f"validate/info_json_check_{size}"
+        if only and not name.startswith(only):
+            continue
+        with tempfile.TemporaryDirectory() as course:
+            synthetic_course(course, size)
+            samples = []
+            for i in range(repeat):
+                last = i == repeat - 1
+                profile_to = last and output(profile_dir, name, ".prof")
+                samples.append(run_validator(course, profile_to))
+        keep(name, samples)
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """The benchmarks slower than their baseline by more than `threshold`"""
+    slower = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before and result["seconds"] > before["seconds"] * (1 + threshold):
+            slower.append((name, before["seconds"], result["seconds"]))
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Save as the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help=f"Allowed slowdown as a fraction (default: the baseline's, "
+        f"else {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--profile", help="Write cProfile stats to this directory")
+    parser.add_argument(
+        "--sample-profile", help="Write sampled stacks to this directory"
+    )
+    parser.add_argument("--only", help="Only run benchmarks starting with this")
+
+    args = parser.parse_args()
+    for directory in (args.profile, args.sample_profile):
+        if directory:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+    results = run_all(args.repeat, args.only, args.profile, args.sample_profile)
+
+    baseline = {}
+    if Path(args.baseline).is_file():
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = baseline.get("threshold", DEFAULT_THRESHOLD)
+
+    if args.save:
+        baseline["threshold"] = threshold
+        baseline.setdefault("results", {}).update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        sys.exit(0)
+
+    slower = regressions(results, baseline, threshold)
+    for name, before, now in slower:
+        print(
+            f"REGRESSION {name}: {before * 1000:.2f} ms -> {now * 1000:.2f} ms "
+            f"(over {threshold:.0%} slower)"
+        )
+    sys.exit(1 if slower else 0)
@@ -0,0 +1,46 @@
+"""
+Packs each question's grader files into tests/question.fpb, a single
+memory-mappable archive that the graders read instead of many small files.
+
+Usage: python3 tools/bundle.py [--list | --check] [QUESTION_DIR ...]
+
+With --check, nothing is written, and the exit status is 1 if any existing
+bundle is stale. Graders only skip bundles older than the question's
+server.py, tests/ or res/, so rebundle after editing a bundled file.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_bundle import BUNDLE_NAME, Bundle, write_bundle
+from fpp_source import question_dirs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument(
+        "--list", action="store_true", help="List bundle members instead of packing"
+    )
+
+    parser.add_argument("--check", action="store_true", help="Only compare")
+
+    args = parser.parse_args()
+    stale = False
+    for qdir in args.questions or question_dirs():
+        path = Path(qdir) / BUNDLE_NAME
+        if args.check:
+            if path.is_file():
+                with Bundle(path) as bundle:
+                    if not bundle.is_fresh(qdir):
+                        stale = True
+                        print(f"    stale: {os.path.relpath(path)}")
+        elif args.list:
+            with Bundle(path) as bundle:
+                for rel, (offset, length, *_) in bundle.index.items():
+                    print(f"{os.path.relpath(path)}: {rel} ({length} B at {offset})")
+        else:
+            path = write_bundle(qdir)
+            print(f"Packed {os.path.relpath(path)} ({path.stat().st_size} bytes)")
+    sys.exit(1 if stale else 0)
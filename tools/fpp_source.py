@@ -0,0 +1,180 @@
+"""
+Helpers for reading Faded Parsons question sources (eg questions/sublist.py)
+and locating the question directories generated from them.
+"""
+import re
+import sys
+from pathlib import Path
+
+COURSE_ROOT = Path(__file__).resolve().parent.parent
+QUESTIONS_DIR = COURSE_ROOT / "questions"
+SERVER_FILES_DIR = COURSE_ROOT / "serverFilesCourse"
+
+# tools share the course-level helpers PrairieLearn puts on the path
+if str(SERVER_FILES_DIR) not in sys.path:
+    sys.path.append(str(SERVER_FILES_DIR))
+
+from fp_lines import split_comment  # noqa: E402 needs the path above
+
+# `## name ## optional comment` opens or closes the region called `name`
+DELIMITER = re.compile(r"^##\s*([^#]*?)\s*##(.*)$")
+# `## import file as region ##` pulls a region in from another file
+IMPORT = re.compile(r"^import\s+(\S+)\s+as\s+(\S+)$")
+
+
+def delimiter_name(line):
+    """Returns the region name if `line` is a region delimiter, else None"""
+    match = DELIMITER.match(line)
+    return match.group(1) if match else None
+
+
+def iter_regions(lines):
+    """Yields `(name, body)` for each run of `lines`, where `body` iterates
+    the run's lines without their newlines. Code outside any region comes
+    back under the name None and import directives come back with an empty
+    body. Like itertools.groupby, a body must be used before advancing.
+    """
+    stream = (line.rstrip("\r\n") for line in lines)
+    held = []
+
+    def next_line():
+        return held.pop() if held else next(stream, None)
+
+    def region_body(name):
+        while (line := next_line()) is not None:
+            if delimiter_name(line) == name:
+                return
+            yield line
+        raise ValueError(f"Region {name} is never closed")
+
+    def outside_body(first):
+        yield first
+        while (line := next_line()) is not None:
+            if delimiter_name(line) is not None:
+                held.append(line)
+                return
+            yield line
+
+    while (line := next_line()) is not None:
+        name = delimiter_name(line)
+        if name is None:
+            body = outside_body(line)
+        elif IMPORT.match(name):
+            body = iter(())
+        else:
+            body = region_body(name)
+        yield name, body
+        # skip whatever the caller left unread
+        for _ in body:
+            pass
+
+
+def resource_path(region):
+    """Maps a `res/...` region name to its path in the question directory,
+    adding the default .py extension when the name has none
+    """
+    path = Path(region)
+    return path if path.suffix else path.with_suffix(".py")
+
+
+def question_dir(source):
+    """The directory generated from `source`, eg questions/sublist/"""
+    return Path(source).with_suffix("")
+
+
+def question_sources(root=QUESTIONS_DIR):
+    """Every question source under `root` that has a generated directory"""
+    return sorted(p for p in Path(root).rglob("*.py") if question_dir(p).is_dir())
+
+
+def question_dirs(root=QUESTIONS_DIR):
+    """Every directory under `root` that holds a gradable question"""
+    infos = Path(root).rglob("info.json")
+    return sorted(p.parent for p in infos if (p.parent / "tests").is_dir())
+
+
+# `?answer?` marks a blank the student fills in
+BLANK = re.compile(r"\?([^?]*)\?")
+# `#Ngiven` fixes a line's indentation at N levels
+GIVEN = re.compile(r"#(\d+)given")
+# `#blank hint` shows `hint` in the line's blanks
+BLANK_HINT = re.compile(r"#blank\s*([^#]*?)\s*(?=#|$)")
+INDENT_WIDTH = 4
+
+
+class Line:
+    """One line of a question's line bank"""
+
+    def __init__(self, id, code, indent, blanks=(), given=None, hint=None):
+        self.id = id
+        # the line's code with each blank replaced by !BLANK
+        self.code = code
+        self.indent = indent
+        self.blanks = list(blanks)
+        self.given = given
+        self.hint = hint
+
+    def __repr__(self):
+        return f"Line({self.id}, {self.code!r}, indent={self.indent})"
+
+    def bank_text(self):
+        """The line as it appears in question.html"""
+        notes = [f"#blank {self.hint}" if self.hint else ""]
+        notes.append("" if self.given is None else f"#{self.given}given")
+        return " ".join([self.code, *filter(None, notes)])
+
+
+def code_lines(lines):
+    """The code of a source outside any region, without docstrings,
+    comment lines or blank lines
+    """
+    docstring = None
+    for name, body in iter_regions(lines):
+        if name is not None:
+            continue
+        for line in body:
+            stripped = line.strip()
+            if docstring:
+                if docstring in stripped:
+                    docstring = None
+                continue
+            for quotes in ['"""', "'''"]:
+                if stripped.startswith(quotes):
+                    if quotes not in stripped[3:]:
+                        docstring = quotes
+                    break
+            else:
+                if stripped and not stripped.startswith("#"):
+                    yield line.rstrip()
+
+
+def parse_line(id, line):
+    body = line.lstrip()
+    indent = (len(line) - len(body)) // INDENT_WIDTH
+    blanks = BLANK.findall(body)
+    # blanks can hold `#`, so find the comment with them masked out
+    code, comment = split_comment(BLANK.sub("!BLANK", body))
+    given = GIVEN.search(comment)
+    hint = BLANK_HINT.search(comment)
+    return Line(
+        id,
+        code,
+        indent,
+        blanks,
+        given=int(given.group(1)) if given else None,
+        hint=hint.group(1) if hint and hint.group(1) else None,
+    )
+
+
+def parse_line_bank(source):
+    """The line bank of `source` in reference order"""
+    with open(source, encoding="utf-8") as f:
+        return [parse_line(i, line) for i, line in enumerate(code_lines(f))]
+
+
+def source_for(question, root=QUESTIONS_DIR):
+    """The source of a question given its directory or its QUID"""
+    quid = Path(question).as_posix().rstrip("/")
+    if quid.startswith("questions/"):
+        quid = quid[len("questions/") :]
+    return Path(root) / f"{quid}.py"
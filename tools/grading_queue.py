@@ -0,0 +1,320 @@
+"""
+Grades submissions on this machine from a queue instead of one container per
+submission. Submissions wait in a file-backed spool, standing in for a broker,
+and are taken in order of their assessment deadline into a bounded in-memory
+queue, which a pool of warm grading processes drains. While the queue is
+full, submissions stay in the spool. Results are written back to the spool
+and printed as JSON lines as they complete.
+
+Usage: python3 tools/grading_queue.py submit [--spool DIR] [--deadline TIME]
+                                             QUESTION SUBMISSION
+       python3 tools/grading_queue.py serve [--spool DIR] [--workers N]
+                                            [--max-queued N] [--once]
+                                            [--cache-questions N]
+
+The spool holds incoming/, claimed/, done/ and results/ directories. A
+submission is claimed by moving it from incoming/ to claimed/, and moved on to
+done/ once its result is written. Claimed submissions go back to incoming/
+when the service restarts.
+
+Whatever a submission does to its grading process, it only fails itself:
+exceptions that aren't Exceptions (eg SystemExit) are caught in the worker,
+and the pool (see local_grader.GradingPool) kills workers past their deadline
+and regrades alone the submissions whose pool broke under them.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from analytics import timestamp
+from fp_fixtures import prune as prune_fixtures
+from fpp_source import COURSE_ROOT
+from load_test import grading_timeout
+from local_grader import (
+    CACHED_QUESTIONS,
+    KILL_GRACE,
+    GradingPool,
+    GradingTimeout,
+    resolve_question,
+    time_limit,
+    warm_up,
+    worker_questions,
+)
+
+DEFAULT_SPOOL = COURSE_ROOT / ".grading-spool"
+DEFAULT_QUEUED = 64
+POLL_SECONDS = 0.2
+# sorts after any real deadline, for submissions without one
+NO_DEADLINE = 10**15 - 1
+
+
+class Submission:
+    def __init__(self, id, question, source, deadline=None, submitted_at=None):
+        self.id = id
+        self.question = question
+        self.source = source
+        self.deadline = deadline
+        self.submitted_at = time.time() if submitted_at is None else submitted_at
+
+    def priority(self):
+        return NO_DEADLINE if self.deadline is None else int(self.deadline * 1000)
+
+    def qdir(self):
+        return resolve_question(self.question)
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "question": self.question,
+            "source": self.source,
+            "deadline": self.deadline,
+            "submitted_at": self.submitted_at,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        deadline = data.get("deadline")
+        return cls(
+            data["id"],
+            data["question"],
+            data["source"],
+            None if deadline is None else timestamp(deadline),
+            data.get("submitted_at"),
+        )
+
+
+class Spool:
+    """Submissions and results as files. Incoming file names start with the
+    deadline in milliseconds, so listing them sorted gives priority order.
+    """
+
+    def __init__(self, root=DEFAULT_SPOOL):
+        self.root = Path(root)
+        self.incoming = self.root / "incoming"
+        self.claimed = self.root / "claimed"
+        self.done = self.root / "done"
+        self.results = self.root / "results"
+        for directory in (self.incoming, self.claimed, self.done, self.results):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, directory, name, data):
+        tmp = self.root / f".{name}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, directory / name)
+        return directory / name
+
+    def put(self, submission):
+        name = f"{submission.priority():015d}-{submission.id}.json"
+        return self._write(self.incoming, name, submission.to_json())
+
+    def recover(self):
+        """Returns submissions claimed by a service that stopped to incoming"""
+        for path in self.claimed.glob("*.json"):
+            os.replace(path, self.incoming / path.name)
+
+    def pending(self):
+        return sorted(self.incoming.glob("*.json"))
+
+    def claim(self, path):
+        """Moves a submission to claimed/ and reads it, or returns None when
+        another service claimed it first
+        """
+        claimed = self.claimed / path.name
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return None
+        with open(claimed) as f:
+            return Submission.from_json(json.load(f)), claimed
+
+    def finish(self, claimed, result):
+        self._write(self.results, f"{result['id']}.json", result)
+        try:
+            os.replace(claimed, self.done / claimed.name)
+        except FileNotFoundError:
+            pass
+
+
+def grade_submission(qdir, source, timeout):
+    """Grades one submission in a worker, keeping recently graded questions'
+    compiled code between submissions. Never raises, so that nothing a
+    submission does (eg sys.exit()) reaches the service.
+    """
+    start = time.perf_counter()
+    try:
+        with time_limit(timeout):
+            results, status = worker_questions.grade(qdir, source), "ok"
+    except GradingTimeout:
+        results, status = {"gradable": True, "score": 0.0, "tests": []}, "timeout"
+    except BaseException as e:
+        results = {"gradable": False, "score": 0.0, "tests": [], "output": repr(e)}
+        status = "error"
+    results.update(
+        status=status,
+        grading_seconds=time.perf_counter() - start,
+        worker={"pid": os.getpid(), "question_cache": worker_questions.stats()},
+    )
+    return results
+
+
+class GradingQueue:
+    """A bounded priority queue of submissions drained by `workers` warm
+    grading processes. `submit` waits while the queue is full.
+    """
+
+    def __init__(
+        self, workers=None, max_queued=DEFAULT_QUEUED, cache_questions=CACHED_QUESTIONS
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        # questions each worker keeps compiled
+        self.cache_questions = cache_questions
+        self.queue = asyncio.PriorityQueue(max_queued)
+        self.results = asyncio.Queue()
+        self.timeouts = {}
+        self.order = itertools.count()
+        self.pool = None
+
+    async def submit(self, submission, claimed=None):
+        queued = time.time()
+        entry = (submission.priority(), next(self.order), submission, claimed, queued)
+        await self.queue.put(entry)
+
+    def full(self):
+        return self.queue.full()
+
+    async def _work(self):
+        while True:
+            _, _, submission, claimed, queued = await self.queue.get()
+            qdir = submission.qdir()
+            timeout = self.timeouts.setdefault(qdir, grading_timeout(qdir))
+            started = time.time()
+            try:
+                result = await self.pool.run(
+                    timeout + KILL_GRACE,
+                    grade_submission,
+                    qdir,
+                    submission.source,
+                    timeout,
+                )
+            except GradingTimeout:  # its worker had to be killed
+                result = {"gradable": True, "score": 0.0, "tests": []}
+                result["status"] = "timeout"
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                raise
+            except BaseException as e:  # its worker died, or it couldn't be sent
+                result = {"gradable": False, "score": 0.0, "output": repr(e)}
+                result["status"] = "error"
+            result.update(
+                id=submission.id,
+                question=submission.question,
+                deadline=submission.deadline,
+                queued_seconds=started - queued,
+            )
+            await self.results.put((result, claimed))
+            self.queue.task_done()
+
+    async def run(self):
+        """Grades submissions until cancelled"""
+        self.pool = GradingPool(self.workers, warm_up, (self.cache_questions,))
+        workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            # the submissions still grading go back to incoming/ on restart
+            self.pool.shutdown(kill=True)
+
+
+async def feed(spool, grading, once=False):
+    """Moves submissions from the spool into the queue, earliest deadline
+    first, leaving them in the spool while the queue is full
+    """
+    while True:
+        pending = spool.pending()
+        for path in pending:
+            if grading.full():
+                break
+            claimed = spool.claim(path)
+            if claimed:
+                await grading.submit(*claimed)
+        if once and not pending:
+            await grading.queue.join()
+            if not spool.pending():
+                return
+        await asyncio.sleep(POLL_SECONDS)
+
+
+async def report(spool, grading, out=sys.stdout):
+    """Writes each result back to the spool and out as it completes"""
+    while True:
+        result, claimed = await grading.results.get()
+        spool.finish(claimed, result)
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        grading.results.task_done()
+
+
+async def serve(
+    spool,
+    workers=None,
+    max_queued=DEFAULT_QUEUED,
+    once=False,
+    cache_questions=CACHED_QUESTIONS,
+):
+    spool.recover()
+    grading = GradingQueue(workers, max_queued, cache_questions)
+    service = asyncio.create_task(grading.run())
+    reporter = asyncio.create_task(report(spool, grading))
+    try:
+        await feed(spool, grading, once)
+        await grading.results.join()
+    finally:
+        service.cancel()
+        reporter.cancel()
+        await asyncio.gather(service, reporter, return_exceptions=True)
+        # the workers have stopped, so their fixtures are unheld
+        prune_fixtures()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit = commands.add_parser("submit", help="Add a submission to the spool")
+    submit.add_argument("question", help="A question directory or QUID")
+    submit.add_argument("submission", help="The file to grade")
+    submit.add_argument("--deadline", help="ISO 8601 time or seconds since epoch")
+    submit.add_argument("--spool", default=DEFAULT_SPOOL)
+    server = commands.add_parser("serve", help="Grade submissions from the spool")
+    server.add_argument("--spool", default=DEFAULT_SPOOL)
+    server.add_argument("--workers", type=int, help="Grading processes")
+    server.add_argument("--max-queued", type=int, default=DEFAULT_QUEUED)
+    server.add_argument("--once", action="store_true", help="Stop when idle")
+    server.add_argument(
+        "--cache-questions",
+        type=int,
+        default=CACHED_QUESTIONS,
+        help="Questions each worker keeps compiled",
+    )
+
+    args = parser.parse_args()
+    if args.command == "submit":
+        deadline = args.deadline
+        if deadline is not None:
+            deadline = timestamp(float(deadline) if deadline.isdigit() else deadline)
+        with open(args.submission, encoding="utf-8") as f:
+            submission = Submission(uuid.uuid4().hex, args.question, f.read(), deadline)
+        print(os.path.relpath(Spool(args.spool).put(submission)))
+    else:
+        spool = Spool(args.spool)
+        asyncio.run(
+            serve(spool, args.workers, args.max_queued, args.once, args.cache_questions)
+        )
@@ -0,0 +1,119 @@
+"""
+Builds each question's hint index (tests/hint_index.json) from the hints an
+instructor wrote in the question's hints.json, counting how often each
+pattern shows up among wrong submissions in past grading results. The most
+common patterns that have no hint yet are listed, as candidates for new
+hints. See serverFilesCourse/fp_hints.py for the patterns. Graders only
+read the index, so rerun this and commit the index with each hints.json
+change.
+
+Usage: python3 tools/hint_index.py [--top N] [RESULTS.jsonl ...]
+
+hints.json is a list of {"pattern": ..., "hint": ...}, or of
+{"source": ..., "hint": ...} to match a whole wrong submission, eg
+    [{"pattern": "fill 2 False", "hint": "When can you stop searching?"}]
+
+Results are as for tools/analytics.py. A result's "source" gives every
+pattern, "blanks" its fill patterns and "lines" ([line id, indent] pairs) its
+order and indent patterns.
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+from analytics import TopK, read_results
+from fp_hints import INDEX_FILE, HintIndex, normalize, source_hash
+from fpp_source import QUESTIONS_DIR, parse_line_bank, question_dirs, source_for
+from local_grader import ANSWER_FILE
+
+HINTS_FILE = "hints.json"
+TRACKED = 1000  # distinct patterns counted per question
+UNHINTED = 10  # patterns listed per question
+
+
+def empty_index(qdir):
+    source = source_for(qdir)
+    bank = parse_line_bank(source) if source.is_file() else []
+    return HintIndex([[line.code, line.indent] for line in bank], [], {})
+
+
+def result_patterns(index, result):
+    if "source" in result:
+        yield from index.source_patterns(result["source"])
+        return
+    for i, fill in enumerate(result.get("blanks", [])):
+        yield f"fill {i} {normalize(fill)}"
+    previous = None
+    for id, indent in result.get("lines", []):
+        if not 0 <= id < len(index.lines):
+            continue
+        if indent != index.lines[id][1]:
+            yield f"indent {id} {indent}"
+        if previous is not None and previous > id:
+            yield f"order {previous} {id}"
+        previous = id
+
+
+def reference_patterns(qdir, index):
+    """The patterns of the reference answer, which are never mistakes"""
+    answer = Path(qdir) / ANSWER_FILE
+    if not answer.is_file():
+        return set()
+    return set(index.source_patterns(answer.read_text()))
+
+
+def count_patterns(results, indexes, tracked=TRACKED):
+    """Counts the patterns of each question's wrong submissions. `indexes`
+    maps each QUID to (index, patterns of the reference answer).
+    """
+    counts = {}
+    for result in results:
+        index, reference = indexes.get(str(result.get("question")), (None, None))
+        if index is None or float(result.get("score", 0.0)) >= 1.0:
+            continue
+        top = counts.setdefault(str(result["question"]), TopK(tracked))
+        for pattern in set(result_patterns(index, result)) - reference:
+            top.add(pattern)
+    return counts
+
+
+def add_hints(index, hints, counts):
+    for entry in hints:
+        if "source" in entry:
+            pattern = f"source {source_hash(entry['source'])}"
+        else:
+            pattern = entry["pattern"]
+        if entry["hint"] not in index.hints:
+            index.hints.append(entry["hint"])
+        index.patterns[pattern] = [
+            index.hints.index(entry["hint"]),
+            counts.get(pattern, 0),
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("results", nargs="*", help="Result logs (.jsonl, .gz or -)")
+    parser.add_argument("--top", type=int, default=TRACKED, help="Patterns counted")
+
+    args = parser.parse_args()
+    indexes = {}
+    for qdir in question_dirs():
+        index = empty_index(qdir)
+        quid = os.path.relpath(qdir, QUESTIONS_DIR)
+        indexes[quid] = index, reference_patterns(qdir, index)
+    counts = count_patterns(read_results(args.results), indexes, args.top)
+
+    for quid, (index, _) in sorted(indexes.items()):
+        qdir = QUESTIONS_DIR / quid
+        common = dict(counts[quid].most_common()) if quid in counts else {}
+        hints_path = qdir / HINTS_FILE
+        if hints_path.is_file():
+            with open(hints_path) as f:
+                add_hints(index, json.load(f), common)
+            index.dump(qdir / INDEX_FILE)
+            print(f"Wrote {len(index.patterns)} hinted patterns to {qdir / INDEX_FILE}")
+        unhinted = [(p, n) for p, n in common.items() if p not in index.patterns]
+        for pattern, n in unhinted[:UNHINTED]:
+            print(f"  {quid}: no hint for {pattern!r} ({n} wrong submissions)")
@@ -0,0 +1,108 @@
+"""
+Imports every question's server.py and tests/*.py in a fresh interpreter with
+`-X importtime` and ranks the modules and imported packages that cost the
+most, course-wide. Tests import against the local grader's stand-ins.
+
+Usage: python3 tools/import_profile.py [--top N] [--json FILE] [QUESTION_DIR ...]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from fpp_source import SERVER_FILES_DIR, question_dirs
+from local_grader import STANDINS_DIR
+
+MODULES = ["server.py", "tests/setup_code.py", "tests/ans.py", "tests/test.py"]
+MARKER = "--fp-import-profile--"
+# runs the module after interpreter startup, which importtime also reports
+RUNNER = f"""
+import pkgutil, runpy, sys, time
+sys.stderr.write({MARKER!r} + "\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="__fp_profile__")
+print(time.perf_counter() - start)
+"""
+IMPORT_TIME = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)")
+
+
+def profile_module(path):
+    """Returns (seconds to run `path`, {top-level import: cumulative us}),
+    with seconds None if the module raised
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(STANDINS_DIR), str(SERVER_FILES_DIR), env.get("PYTHONPATH", "")]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER, str(path)],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=Path(path).parent,
+    )
+    imports = {}
+    started = False
+    for line in proc.stderr.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        match = IMPORT_TIME.match(line)
+        # nested imports are indented under the import that caused them
+        if started and match and len(match.group(3)) == 1:
+            imports[match.group(4)] = int(match.group(2))
+    seconds = float(proc.stdout.split()[-1]) if proc.returncode == 0 else None
+    return seconds, imports
+
+
+def profile(qdirs):
+    rows = []
+    for qdir in qdirs:
+        for rel in MODULES:
+            path = Path(qdir) / rel
+            if path.is_file():
+                seconds, imports = profile_module(path)
+                rows.append(
+                    {
+                        "module": os.path.relpath(path),
+                        "seconds": seconds,
+                        "import_us": sum(imports.values()),
+                        "imports": imports,
+                    }
+                )
+    return rows
+
+
+def rank_packages(rows):
+    """Total cumulative import time of each package across all modules"""
+    totals = defaultdict(int)
+    for row in rows:
+        for package, us in row["imports"].items():
+            totals[package] += us
+    return sorted(totals.items(), key=lambda kv: -kv[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument("--top", type=int, default=10, help="Rows per ranking")
+    parser.add_argument("--json", help="Also write the raw timings here")
+
+    args = parser.parse_args()
+    rows = profile(args.questions or question_dirs())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    print("Slowest modules to import:")
+    for row in sorted(rows, key=lambda r: -r["import_us"])[: args.top]:
+        status = "" if row["seconds"] is not None else "  (raised)"
+        print(f"  {row['import_us'] / 1000:9.1f} ms  {row['module']}{status}")
+    print("Costliest imports course-wide:")
+    for package, us in rank_packages(rows)[: args.top]:
+        print(f"  {us / 1000:9.1f} ms  {package}")
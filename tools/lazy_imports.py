@@ -0,0 +1,140 @@
+"""
+Rewrites a generated test module so that imports used only inside some of
+its tests are made inside those tests instead of at import time. Imports
+that are never used are left in place, as they may be imported for their
+side effects, and reported.
+
+Usage: python3 tools/lazy_imports.py [--write] MODULE [...]
+Without --write the rewritten modules are printed.
+"""
+import argparse
+import ast
+import sys
+from collections import defaultdict
+
+MODULE_LEVEL = None
+
+
+def bound_names(node):
+    """The names each alias of an import statement binds"""
+    for alias in node.names:
+        yield alias, alias.asname or alias.name.split(".")[0]
+
+
+class Uses(ast.NodeVisitor):
+    """Maps each name to the functions it is loaded in, with MODULE_LEVEL
+    standing for code run at import time (including decorators and defaults)
+    """
+
+    def __init__(self):
+        self.uses = defaultdict(set)
+        self.scope = MODULE_LEVEL
+        self.tests = set()
+
+    def visit_Name(self, node):
+        self.uses[node.id].add(self.scope)
+
+    def visit_FunctionDef(self, node):
+        for outer in node.decorator_list + [node.args, node.returns]:
+            if outer is not None:
+                self.visit(outer)
+        outer_scope = self.scope
+        # nested functions import in the outermost one, and a body on the
+        # def's own line has nowhere to put an import
+        if outer_scope is MODULE_LEVEL and node.body[0].lineno != node.lineno:
+            self.scope = node
+            if node.name.startswith("test"):
+                self.tests.add(node)
+        for statement in node.body:
+            self.visit(statement)
+        self.scope = outer_scope
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def body_start(function):
+    """The line number an import can be inserted before in `function`"""
+    first = function.body[0]
+    if (
+        isinstance(first, ast.Expr)
+        and isinstance(first.value, ast.Constant)
+        and isinstance(first.value.value, str)
+        and len(function.body) > 1
+    ):
+        first = function.body[1]
+    return first.lineno, first.col_offset
+
+
+def lazify(source):
+    """Returns `source` with its lazy-able module level imports moved, and
+    (line, name) of each import that is never used
+    """
+    tree = ast.parse(source)
+    visitor = Uses()
+    for statement in tree.body:
+        if not isinstance(statement, (ast.Import, ast.ImportFrom)):
+            visitor.visit(statement)
+    uses, tests = visitor.uses, visitor.tests
+
+    unused = []
+    removals = []  # (first line, last line, replacement)
+    insertions = defaultdict(list)  # function -> import statements
+    for statement in tree.body:
+        if not isinstance(statement, (ast.Import, ast.ImportFrom)):
+            continue
+        if getattr(statement, "module", None) == "__future__":
+            continue
+        keep = []
+        for alias, name in bound_names(statement):
+            scopes = uses.get(name, set())
+            if not scopes:
+                unused.append((statement.lineno, name))
+            # anything outside the tests, or every test, needs it anyway
+            if not scopes or not scopes < tests:
+                keep.append(alias)
+                continue
+            moved = type(statement)(names=[alias])
+            if isinstance(statement, ast.ImportFrom):
+                moved.module, moved.level = statement.module, statement.level
+            for function in scopes:
+                insertions[function].append(ast.unparse(moved))
+        if len(keep) == len(statement.names):
+            continue
+        replacement = None
+        if keep:
+            kept = type(statement)(names=keep)
+            if isinstance(statement, ast.ImportFrom):
+                kept.module, kept.level = statement.module, statement.level
+            replacement = ast.unparse(kept)
+        removals.append((statement.lineno, statement.end_lineno, replacement))
+
+    lines = source.splitlines(keepends=True)
+    edits = list(removals)
+    for function, statements in insertions.items():
+        lineno, col = body_start(function)
+        text = "".join(f"{' ' * col}{s}\n" for s in sorted(set(statements)))
+        edits.append((lineno, lineno - 1, text))
+    # apply from the bottom up so earlier line numbers stay valid
+    for first, last, text in sorted(edits, reverse=True):
+        if last >= first:
+            text = f"{text}\n" if text else ""
+        lines[first - 1 : last] = [text] if text else []
+    return "".join(lines), unused
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="+", help="Python files to rewrite")
+    parser.add_argument("--write", action="store_true", help="Rewrite in place")
+
+    args = parser.parse_args()
+    for path in args.modules:
+        with open(path) as f:
+            rewritten, unused = lazify(f.read())
+        for lineno, name in unused:
+            print(f"{path}:{lineno}: {name} is never used", file=sys.stderr)
+        if args.write:
+            with open(path, "w") as f:
+                f.write(rewritten)
+        else:
+            print(f"# {path}\n{rewritten}")
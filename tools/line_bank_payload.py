@@ -0,0 +1,90 @@
+"""
+Compiles the line bank of each question's <pl-faded-parsons> block into a
+compact JSON payload in clientFilesQuestion/, so rendering looks lines up
+instead of re-parsing the block's text. The payload's file name carries its
+content hash, so it can be served with long-lived cache headers. With
+--link, the block's `line-bank-payload` attribute is pointed at it; leave
+that off until <pl-faded-parsons> accepts the attribute.
+
+Usage: python3 tools/line_bank_payload.py [--link] [QUESTION_DIR ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_atomic import atomic_write
+from fpp_source import parse_line, question_dirs
+
+BLOCK = re.compile(r"(<pl-faded-parsons\b[^>]*>)(.*?)(</pl-faded-parsons>)", re.S)
+PAYLOAD_ATTRIBUTE = re.compile(r'\s+line-bank-payload="[^"]*"')
+PAYLOAD_GLOB = "line_bank.*.json"
+
+
+def compile_payload(block):
+    """The payload of the line bank in the text of a <pl-faded-parsons>"""
+    texts = [text.strip() for text in block.splitlines() if text.strip()]
+    lines = [parse_line(i, text) for i, text in enumerate(texts)]
+    payload = {
+        "ids": [line.id for line in lines],
+        "code": [line.code for line in lines],
+        # [line id, indent] of each line whose indentation is given
+        "given": [[line.id, line.given] for line in lines if line.given is not None],
+        # [line id, slot within the line, hint] of each blank
+        "blanks": [
+            [line.id, slot, line.hint]
+            for line in lines
+            for slot in range(line.code.count("!BLANK"))
+        ],
+    }
+    encoded = json.dumps(payload, separators=(",", ":"), sort_keys=True)
+    payload["hash"] = hashlib.sha256(encoded.encode()).hexdigest()
+    return payload
+
+
+def write_payload(qdir, link=False):
+    """Writes the payload of the question in `qdir` and returns its path,
+    or None if its question.html has no line bank
+    """
+    qdir = Path(qdir)
+    html_path = qdir / "question.html"
+    html = html_path.read_text()
+    match = BLOCK.search(html)
+    if match is None:
+        return None
+    payload = compile_payload(match.group(2))
+
+    client_files = qdir / "clientFilesQuestion"
+    client_files.mkdir(exist_ok=True)
+    path = client_files / f"line_bank.{payload['hash'][:12]}.json"
+    if not path.exists():
+        with atomic_write(path) as f:
+            json.dump(payload, f, separators=(",", ":"))
+    for old in client_files.glob(PAYLOAD_GLOB):
+        if old != path:
+            old.unlink()
+
+    if link:
+        tag = PAYLOAD_ATTRIBUTE.sub("", match.group(1))
+        tag = f'{tag[:-1]} line-bank-payload="{path.name}">'
+        if tag != match.group(1):
+            html = html[: match.start(1)] + tag + html[match.end(1) :]
+            html_path.write_text(html)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument(
+        "--link", action="store_true", help="Point question.html at the payload"
+    )
+
+    args = parser.parse_args()
+    for qdir in args.questions or question_dirs():
+        path = write_payload(qdir, link=args.link)
+        if path is not None:
+            print(f"Wrote {os.path.relpath(path)}")
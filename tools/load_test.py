@@ -0,0 +1,256 @@
+"""
+Replays Faded Parsons submissions against the local grader at a configurable
+concurrency and arrival rate, then reports throughput, p50/p95/p99 latency
+and the rate of submissions slower than each question's grading timeout.
+
+Usage: python3 tools/load_test.py [--submissions FILE] [--count N]
+                                  [--concurrency N] [--rate PER_SECOND]
+                                  [--out FILE] [--compare FILE] [QUESTION_DIR ...]
+
+Recorded submissions are JSON lines with "question" (a question directory or
+QUID) and "source". Without them, each question gets synthetic submissions:
+its reference answer and copies with two adjacent lines swapped.
+
+Overall throughput is submissions per second of the run. Each question's is
+submissions per second spent grading it, so questions can be compared.
+
+Jobs run on a local_grader.GradingPool, so a submission that hangs its worker
+is killed at its deadline and one that kills its worker only fails itself.
+Interrupting the run (Ctrl-C) reports the submissions graded so far.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_fixtures import prune as prune_fixtures
+from fpp_source import QUESTIONS_DIR, question_dirs
+from local_grader import (
+    ANSWER_FILE,
+    KILL_GRACE,
+    GradingPool,
+    GradingTimeout,
+    resolve_question,
+    time_limit,
+    warm_up,
+    worker_questions,
+)
+
+DEFAULT_TIMEOUT = 30
+PERCENTILES = [50, 95, 99]
+
+
+def grade_job(qdir, source, timeout):
+    """Grades one submission in a worker, which keeps each question's
+    compiled code between jobs. Returns (seconds, score, status), where
+    status is "ok", "error" if grading itself failed, or "timeout".
+    """
+    start = time.perf_counter()
+    try:
+        with time_limit(timeout):
+            score, status = worker_questions.grade(qdir, source)["score"], "ok"
+    except GradingTimeout:
+        score, status = 0.0, "timeout"
+    except BaseException:  # eg SystemExit from the submission
+        score, status = 0.0, "error"
+    return time.perf_counter() - start, score, status
+
+
+def grading_timeout(qdir):
+    try:
+        with open(Path(qdir) / "info.json") as f:
+            options = json.load(f).get("externalGradingOptions", {})
+        return float(options.get("timeout", DEFAULT_TIMEOUT))
+    except (OSError, ValueError):
+        return DEFAULT_TIMEOUT
+
+
+def synthetic_submissions(qdir, count, rng):
+    """The reference answer and `count - 1` copies with a swapped line pair"""
+    answer = (Path(qdir) / ANSWER_FILE).read_text()
+    lines = answer.splitlines()
+    yield answer
+    for _ in range(count - 1):
+        swapped = list(lines)
+        if len(swapped) > 1:
+            i = rng.randrange(len(swapped) - 1)
+            swapped[i], swapped[i + 1] = swapped[i + 1], swapped[i]
+        yield "\n".join(swapped)
+
+
+def recorded_submissions(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                submission = json.loads(line)
+                yield resolve_question(submission["question"]), submission["source"]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def replay(submissions, concurrency, rate, seed, records):
+    """Submits each (question, source) pair, arriving at `rate` per second
+    on average (all at once if 0), and appends one record per submission to
+    `records` as it completes
+    """
+    rng = random.Random(seed)
+    timeouts = {}
+    jobs = []
+    pool = GradingPool(concurrency, warm_up)
+
+    async def submit(qdir, source):
+        timeout = timeouts.setdefault(qdir, grading_timeout(qdir))
+        arrived = time.perf_counter()
+        try:
+            seconds, score, status = await pool.run(
+                timeout + KILL_GRACE, grade_job, qdir, source, timeout
+            )
+        except GradingTimeout:  # its worker had to be killed
+            seconds, score, status = time.perf_counter() - arrived, 0.0, "timeout"
+        except BrokenProcessPool:  # its worker died
+            seconds, score, status = time.perf_counter() - arrived, 0.0, "error"
+        latency = time.perf_counter() - arrived
+        records.append(
+            {
+                "question": os.path.relpath(qdir, QUESTIONS_DIR),
+                "latency": latency,
+                "grading": seconds,
+                "score": score,
+                "timed_out": status == "timeout" or latency > timeout,
+                "error": status == "error",
+            }
+        )
+
+    try:
+        for qdir, source in submissions:
+            jobs.append(asyncio.ensure_future(submit(qdir, source)))
+            if rate > 0:
+                await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*jobs)
+    finally:
+        for job in jobs:
+            job.cancel()
+        # jobs still running when interrupted have no deadline left
+        pool.shutdown(kill=True)
+
+
+def summarize(records, elapsed):
+    by_question = {}
+    for record in records:
+        by_question.setdefault(record["question"], []).append(record)
+
+    def stats(group, seconds):
+        latencies = sorted(r["latency"] for r in group)
+        summary = {
+            "submissions": len(group),
+            "throughput": len(group) / seconds if seconds else None,
+            "timeout_rate": sum(r["timed_out"] for r in group) / len(group),
+            "error_rate": sum(r["error"] for r in group) / len(group),
+            "mean_score": sum(r["score"] for r in group) / len(group),
+        }
+        for p in PERCENTILES:
+            value = percentile(latencies, p)
+            summary[f"p{p}_ms"] = None if value is None else value * 1000
+        return summary
+
+    # a question's throughput is per second its grading kept a worker busy,
+    # as the run's elapsed time is shared by every question
+    return {
+        "elapsed": elapsed,
+        "overall": stats(records, elapsed) if records else {},
+        "questions": {
+            q: stats(group, sum(r["grading"] for r in group))
+            for q, group in sorted(by_question.items())
+        },
+    }
+
+
+def number(value, width=0):
+    """`value` to one decimal place, or "-" when there is none"""
+    return f"{value:{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+
+def compare(current, previous):
+    """Prints each question's p95 and throughput next to a previous run's"""
+    for question, now in current["questions"].items():
+        before = previous.get("questions", {}).get(question)
+        if before is None:
+            continue
+        print(
+            f"{question}: p95 {number(before['p95_ms'])} -> "
+            f"{number(now['p95_ms'])} ms, throughput "
+            f"{number(before['throughput'])} -> {number(now['throughput'])}/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument("--submissions", help="Recorded submissions (JSON lines)")
+    parser.add_argument("--count", type=int, default=50, help="Per question")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrivals/second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the summary here as JSON")
+    parser.add_argument("--compare", help="A previous summary to compare with")
+
+    args = parser.parse_args()
+    if args.submissions:
+        submissions = list(recorded_submissions(args.submissions))
+    else:
+        rng = random.Random(args.seed)
+        submissions = [
+            (str(qdir), source)
+            for qdir in args.questions or question_dirs()
+            for source in synthetic_submissions(qdir, args.count, rng)
+        ]
+        rng.shuffle(submissions)
+
+    records = []
+    start = time.perf_counter()
+    try:
+        asyncio.run(
+            replay(submissions, args.concurrency, args.rate, args.seed, records)
+        )
+    except KeyboardInterrupt:
+        print(
+            f"Interrupted, reporting {len(records)} of {len(submissions)} submissions",
+            file=sys.stderr,
+        )
+    elapsed = time.perf_counter() - start
+    # the workers have stopped, so their fixtures are unheld
+    prune_fixtures()
+    summary = summarize(records, elapsed)
+    summary["config"] = {
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "count": args.count,
+        "submissions": args.submissions,
+    }
+
+    print(f"{'question':28}   n      /s     p50     p95     p99  timeouts  errors")
+    for question, s in summary["questions"].items():
+        print(
+            f"{question:28.28}{s['submissions']:5d}{number(s['throughput'], 8)}"
+            f"{number(s['p50_ms'], 8)}{number(s['p95_ms'], 8)}"
+            f"{number(s['p99_ms'], 8)}"
+            f"{s['timeout_rate']:10.1%}{s['error_rate']:8.1%}"
+        )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(summary, json.load(f))
@@ -0,0 +1,554 @@
+"""
+Grades a submission against a question's tests locally, standing in for the
+prairielearn/grader-python image. Question files are read through the
+question's bundle when it has one (see tools/bundle.py).
+
+Usage: python3 tools/local_grader.py [--check] [--cache FILE] QUESTION_DIR
+                                     [SUBMISSION]
+The reference answer in tests/ans.py is graded when no submission is given.
+With --check, the exit status is 1 unless the submission gets full credit,
+or 77 (skipped) if the tests import a module that isn't installed here.
+With --cache, test results are reused from and saved to a result cache (see
+tools/regrade.py).
+"""
+import argparse
+import ast
+import asyncio
+import functools
+import hashlib
+import importlib
+import json
+import os
+import signal
+import sys
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_bundle import QuestionFiles
+from fp_hints import hints_for
+from fpp_source import COURSE_ROOT, QUESTIONS_DIR, SERVER_FILES_DIR
+
+STANDINS_DIR = Path(__file__).resolve().parent / "pl_standins"
+# questions a QuestionCache keeps
+CACHED_QUESTIONS = 64
+# installed libraries imported by tests (eg numpy) can't always be imported
+# twice, so they stay in sys.modules when a question is evicted
+LIBRARY_PREFIXES = tuple({sys.prefix, sys.base_prefix, sys.exec_prefix})
+# seconds a grading job may run past its time limit before a GradingPool
+# kills its worker
+KILL_GRACE = 5.0
+SETUP_FILE = "tests/setup_code.py"
+ANSWER_FILE = "tests/ans.py"
+TEST_FILE = "tests/test.py"
+# exit status of --check when the question can't be graded here, as in automake
+SKIPPED = 77
+
+
+def standins():
+    """Imports the stand-in grader modules the tests are written against"""
+    if str(STANDINS_DIR) not in sys.path:
+        sys.path.insert(0, str(STANDINS_DIR))
+    import code_feedback
+    import pl_unit_test
+
+    return code_feedback, pl_unit_test
+
+
+def shared_modules():
+    """Imports the modules every question's tests share, the grader
+    stand-ins and the course helpers, and returns the names of all the
+    modules imported so far
+    """
+    standins()
+    paths = [*STANDINS_DIR.glob("*.py"), *SERVER_FILES_DIR.glob("*.py")]
+    for path in sorted(paths):
+        try:
+            importlib.import_module(path.stem)
+        except ImportError:  # a helper needing a library that isn't installed
+            continue
+    return frozenset(sys.modules)
+
+
+def compile_member(files, rel):
+    if not files.exists(rel):
+        return compile("", rel, "exec")
+    data = files.read_bytes(rel)
+    try:
+        return compile(data, str(files.qdir / rel), "exec")
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+
+
+def members_hash(files, *rels):
+    digest = hashlib.sha256()
+    for rel in rels:
+        data = files.read_bytes(rel) if files.exists(rel) else b""
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+        if isinstance(data, memoryview):
+            data.release()
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=64)
+def _files_hash(stats):
+    digest = hashlib.sha256()
+    for name, path, *_ in stats:
+        data = Path(path).read_bytes()
+        digest.update(f"{name}\0{len(data)}\0".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def files_hash(paths):
+    """A hash of the files in `paths` that exist, reread only when one's
+    size or mtime changes. Course files are named relative to the course,
+    so the hash doesn't depend on where it is checked out.
+    """
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        path = Path(path).resolve()
+        name = os.path.relpath(path, COURSE_ROOT)
+        stats.append((name, str(path), stat.st_size, stat.st_mtime_ns))
+    return _files_hash(tuple(sorted(stats)))
+
+
+def shared_hash():
+    """A hash of the grader stand-ins and course helpers every question's
+    tests run with
+    """
+    paths = [*STANDINS_DIR.glob("*.py"), *SERVER_FILES_DIR.glob("*.py")]
+    return files_hash(paths)
+
+
+def resolve_question(question):
+    """The directory of a question given as a path or as a QUID"""
+    qdir = Path(question)
+    return str(qdir if qdir.is_dir() else QUESTIONS_DIR / qdir)
+
+
+def spec_path(qdir):
+    """The declarative test spec of a question, eg questions/sublist_test.json"""
+    qdir = Path(qdir)
+    return qdir.with_name(f"{qdir.name}_test.json")
+
+
+def test_hashes(source):
+    """Hashes each test method of a test file, keyed "Class.method", from
+    its own source and the rest of the file's. Editing one test changes
+    only its hash, and editing the code the tests share changes them all.
+    """
+    try:
+        module = ast.parse(source)
+    except SyntaxError:
+        return {}
+    methods = {}
+    for node in module.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for method in list(node.body):
+            if isinstance(method, ast.FunctionDef) and method.name.startswith("test"):
+                methods[f"{node.name}.{method.name}"] = ast.unparse(method)
+                node.body.remove(method)
+    shared = ast.unparse(module)
+    return {
+        name: hashlib.sha256(f"{shared}\0{method}".encode()).hexdigest()
+        for name, method in methods.items()
+    }
+
+
+def submission_hash(student_code):
+    return hashlib.sha256(student_code.encode()).hexdigest()
+
+
+class Question:
+    """The compiled setup, reference and test code of one question, with
+    the hashes that key its cached test results. Besides the tests and the
+    reference, results depend on the question's other files (eg res/ data),
+    its test spec, the grader stand-ins and the course helpers. The hashes
+    are only computed once a result is cached, as most grading doesn't.
+    """
+
+    def __init__(self, qdir, files=None):
+        self.qdir = Path(qdir)
+        with closing(files or QuestionFiles(qdir)) as files:
+            self.setup_code = compile_member(files, SETUP_FILE)
+            self.ans_code = compile_member(files, ANSWER_FILE)
+            self.test_code = compile_member(files, TEST_FILE)
+
+    @functools.cached_property
+    def reference_hash(self):
+        with closing(QuestionFiles(self.qdir)) as files:
+            # the setup code is hashed too, as both answers run on top of it
+            return members_hash(files, SETUP_FILE, ANSWER_FILE)
+
+    @functools.cached_property
+    def test_hashes(self):
+        with closing(QuestionFiles(self.qdir)) as files:
+            if not files.exists(TEST_FILE):
+                return {}
+            return test_hashes(files.read_text(TEST_FILE))
+
+    @functools.cached_property
+    def support_hash(self):
+        graded = {SETUP_FILE, ANSWER_FILE, TEST_FILE, "server.py"}
+        with closing(QuestionFiles(self.qdir)) as files:
+            data = [rel for rel in files.members() if rel not in graded]
+            support = [
+                members_hash(files, *data),
+                files_hash([spec_path(self.qdir)]),
+                shared_hash(),
+            ]
+        return hashlib.sha256(":".join(support).encode()).hexdigest()
+
+    def result_key(self, test, fingerprint):
+        """The cache key of one test's result for a submission, or None
+        when the test can't be cached
+        """
+        test_hash = self.test_hashes.get(test)
+        if test_hash is None:
+            return None
+        key = f"{test_hash}:{fingerprint}:{self.reference_hash}:{self.support_hash}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+
+def as_module(namespace):
+    return types.SimpleNamespace(
+        **{k: v for k, v in namespace.items() if not k.startswith("__")}
+    )
+
+
+def run_test(case, method_name, feedback):
+    """Runs one test method and returns its result in results.json form"""
+    method = getattr(case, method_name)
+    max_points = getattr(method, "points", 1)
+    feedback.reset()
+    try:
+        method()
+        fraction = 1.0 if feedback.score is None else feedback.score
+    except (GradingTimeout, KeyboardInterrupt):
+        raise
+    except BaseException as e:  # eg SystemExit from the student's code
+        if not feedback.buffer or feedback.buffer[-1] != str(e):
+            feedback.add_feedback(f"{type(e).__name__}: {e}")
+        fraction = 0.0
+    return {
+        "name": getattr(method, "name", method_name),
+        "points": fraction * max_points,
+        "max_points": max_points,
+        "output": "\n".join(feedback.buffer),
+    }
+
+
+def test_methods(test_class):
+    return sorted(n for n in dir(test_class) if n.startswith("test"))
+
+
+class GradingTimeout(BaseException):
+    """Raised when grading outlasts its time limit. Not an Exception, so the
+    tests' own error handling can't swallow it.
+    """
+
+
+def _timed_out(signum, frame):
+    raise GradingTimeout()
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raises GradingTimeout in the block after `seconds`, on platforms
+    with interval timers (the main thread only)
+    """
+    if not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _timed_out)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def grade(question, student_code, stop_early=False, cache=None):
+    """Grades `student_code` (source text) against `question` and returns a
+    dict shaped like the grader's results.json. With `stop_early`, grading
+    ends at the first test that doesn't earn full points. Hints for known
+    mistakes in the submission (see fp_hints.py) become its message.
+
+    With a `cache` (see tools/regrade.py), a test whose source, submission,
+    reference answer and supporting files (see Question) are unchanged
+    since it was last run reuses the result it got then, and only the
+    other tests run.
+    """
+    code_feedback, pl_unit_test = standins()
+    hints = hints_for(question.qdir, student_code)
+    message = {"message": "\n".join(hints)} if hints else {}
+    setup = {"__name__": "setup_code"}
+    exec(question.setup_code, setup)
+    ref = dict(setup, __name__="ans")
+    exec(question.ans_code, ref)
+    st = dict(setup, __name__="user_code")
+    try:
+        exec(compile(student_code, "user_code.py", "exec"), st)
+    except (GradingTimeout, KeyboardInterrupt):
+        raise
+    except BaseException as e:  # eg a top-level sys.exit()
+        return {
+            "gradable": True,
+            "score": 0.0,
+            "tests": [],
+            "output": repr(e),
+            **message,
+        }
+    tests = {"__name__": "test"}
+    exec(question.test_code, tests)
+
+    fingerprint = submission_hash(student_code)
+    results = []
+    fresh = {}
+    for test_class in tests.values():
+        if not (
+            isinstance(test_class, type)
+            and issubclass(test_class, pl_unit_test.PLTestCase)
+            and test_class is not pl_unit_test.PLTestCase
+        ):
+            continue
+        test_class.st = as_module(st)
+        test_class.ref = as_module(ref)
+        for method_name in test_methods(test_class):
+            test = f"{test_class.__name__}.{method_name}"
+            key = question.result_key(test, fingerprint) if cache else None
+            result = cache.get(key) if key else None
+            if result is None:
+                case = test_class(method_name)
+                result = run_test(case, method_name, code_feedback.Feedback)
+                if key:
+                    fresh[key] = result
+            results.append(result)
+            if stop_early and result["points"] < result["max_points"]:
+                break
+        else:
+            continue
+        break
+    if fresh:
+        cache.put_many(fresh)
+
+    total = sum(r["max_points"] for r in results)
+    earned = sum(r["points"] for r in results)
+    return {
+        "gradable": True,
+        "score": earned / total if total else 1.0,
+        "tests": results,
+        **message,
+    }
+
+
+def is_library(module):
+    path = getattr(module, "__file__", None)
+    return path is None or os.path.abspath(path).startswith(LIBRARY_PREFIXES)
+
+
+class QuestionCache:
+    """The compiled Questions of a long-lived grading worker, least recently
+    used first out once there are more than `max_entries` of them. Modules
+    a question's code imported into sys.modules are unregistered along with
+    it, apart from installed libraries and the modules every question
+    shares, and its fixtures (see fp_fixtures.py) are released.
+    """
+
+    def __init__(self, max_entries=CACHED_QUESTIONS):
+        self.max_entries = max_entries
+        # qdir -> (Question, names of the modules it imported)
+        self.questions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # modules no question owns, from warm_up
+        self.shared = frozenset()
+
+    def warm_up(self):
+        """Imports the modules every question shares before any question is
+        graded, so none of them is taken for the first question's own
+        """
+        if not self.shared:
+            self.shared = shared_modules()
+
+    def get(self, qdir):
+        qdir = str(qdir)
+        if qdir in self.questions:
+            self.hits += 1
+            self.questions.move_to_end(qdir)
+            return self.questions[qdir][0]
+        self.misses += 1
+        question = Question(qdir)
+        self.questions[qdir] = question, set()
+        self._evict()
+        return question
+
+    def grade(self, qdir, student_code, **kwargs):
+        """grade() with the question from the cache, noting any modules its
+        code imports so they go when the question does
+        """
+        self.warm_up()
+        question = self.get(qdir)
+        before = set(sys.modules)
+        try:
+            return grade(question, student_code, **kwargs)
+        finally:
+            imported = set(sys.modules) - before
+            if imported and str(qdir) in self.questions:
+                self.questions[str(qdir)][1].update(imported)
+
+    def _evict(self):
+        # the question just added stays, even with max_entries below 1
+        while len(self.questions) > max(self.max_entries, 1):
+            qdir, (question, modules) = self.questions.popitem(last=False)
+            self.evictions += 1
+            if "fp_fixtures" in sys.modules:
+                sys.modules["fp_fixtures"].release_question(qdir)
+            for name in modules - self.shared:
+                module = sys.modules.get(name)
+                if module is not None and not is_library(module):
+                    del sys.modules[name]
+
+    def stats(self):
+        return {
+            "questions": len(self.questions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# the questions this process keeps compiled when it is a grading worker
+worker_questions = QuestionCache()
+
+
+def warm_up(max_questions=CACHED_QUESTIONS):
+    """Initializes a grading worker process: sets how many questions it
+    keeps compiled and imports what every question shares, so no job pays
+    for it. Ctrl-C is left to the parent, which stops the workers itself.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_questions.max_entries = max_questions
+    worker_questions.warm_up()
+
+
+def kill_workers(pool):
+    """Kills the worker processes of a ProcessPoolExecutor"""
+    kill = getattr(pool, "kill_workers", None)  # python 3.14+
+    if kill is not None:
+        kill()
+        return
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+
+
+class GradingPool:
+    """A process pool for grading jobs that outlives what submissions do to
+    its workers. At most `workers` jobs run at once, so none waits in the
+    executor, and each job's deadline is enforced from this process: a job
+    still running at its deadline, whatever it did to its worker's timer,
+    has its pool's workers killed and the pool replaced. When a pool breaks,
+    by a kill or by a worker dying (eg a submission calling os._exit), the
+    jobs it held run again one at a time in a separate one-process pool,
+    where a crash or a timeout can only be the job's own.
+    """
+
+    def __init__(self, workers, initializer=None, initargs=()):
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+        self.slots = asyncio.Semaphore(workers)
+        self.isolation = asyncio.Lock()
+        self.pools = {"shared": self._pool(workers), "isolated": self._pool(1)}
+
+    def _pool(self, workers):
+        return ProcessPoolExecutor(
+            workers, initializer=self.initializer, initargs=self.initargs
+        )
+
+    def _replace(self, kind, pool, kill=False):
+        # only the first job to see a pool fail replaces it
+        if self.pools[kind] is not pool:
+            return
+        self.pools[kind] = self._pool(self.workers if kind == "shared" else 1)
+        if kill:
+            kill_workers(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, kind, deadline, fn, *args):
+        loop = asyncio.get_running_loop()
+        pool = self.pools[kind]
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(pool, fn, *args), deadline
+            )
+        except asyncio.TimeoutError:
+            self._replace(kind, pool, kill=True)
+            raise GradingTimeout() from None
+        except BrokenProcessPool:
+            self._replace(kind, pool)
+            raise
+
+    async def run(self, deadline, fn, *args):
+        """Returns fn(*args) from a worker. Raises GradingTimeout when it
+        runs past `deadline` seconds, and BrokenProcessPool when its own
+        worker died.
+        """
+        try:
+            async with self.slots:
+                return await self._run("shared", deadline, fn, *args)
+        except BrokenProcessPool:
+            async with self.isolation:
+                return await self._run("isolated", deadline, fn, *args)
+
+    def shutdown(self, kill=False):
+        """Waits for the running jobs to finish, or with `kill`, when
+        nothing is left to enforce their deadlines, kills their workers
+        """
+        for pool in self.pools.values():
+            if kill:
+                kill_workers(pool)
+            pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("question", help="A question directory")
+    parser.add_argument("submission", nargs="?", help="The file to grade")
+    parser.add_argument("--check", action="store_true", help="Fail below full credit")
+    parser.add_argument("--cache", help="Reuse test results from this cache")
+
+    args = parser.parse_args()
+    question = Question(args.question)
+    submission = args.submission or Path(args.question) / ANSWER_FILE
+    cache = None
+    if args.cache:
+        from regrade import ResultCache
+
+        cache = ResultCache(args.cache)
+    with open(submission, encoding="utf-8") as f:
+        source = f.read()
+    try:
+        results = grade(question, source, cache=cache)
+    except ModuleNotFoundError as e:
+        if not args.check:
+            raise
+        print(f"{args.question}: skipped, {e.name} isn't installed")
+        sys.exit(SKIPPED)
+    print(json.dumps(results, indent=2))
+    if args.check and results["score"] < 1.0:
+        sys.exit(1)
@@ -0,0 +1,286 @@
+"""
+Checks whether each question's tests catch plausible wrong answers. Mutants of
+tests/ans.py are made at the blanks of the question's source and the lines
+around them (swapped operators, off-by-one constants and bounds, reordered
+lines) and graded on a process pool, each stopping at its first failing test.
+Mutants that pass every test are reported as survivors.
+
+Usage: python3 tools/mutation.py [--workers N] [--json FILE] [QUESTION_DIR ...]
+"""
+import argparse
+import ast
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_lines import split_comment
+from fpp_source import parse_line_bank, question_dirs, source_for
+from load_test import grading_timeout
+from local_grader import (
+    ANSWER_FILE,
+    GradingTimeout,
+    Question,
+    grade,
+    time_limit,
+    warm_up,
+    worker_questions,
+)
+
+# lines either side of a blank that are mutated too
+NEARBY = 1
+SWAPS = {
+    ast.Add: [ast.Sub],
+    ast.Sub: [ast.Add],
+    ast.Mult: [ast.Add, ast.FloorDiv],
+    ast.Div: [ast.Mult],
+    ast.FloorDiv: [ast.Div],
+    ast.Mod: [ast.FloorDiv],
+    ast.Pow: [ast.Mult],
+    ast.Eq: [ast.NotEq],
+    ast.NotEq: [ast.Eq],
+    ast.Lt: [ast.LtE, ast.Gt],
+    ast.LtE: [ast.Lt],
+    ast.Gt: [ast.GtE, ast.Lt],
+    ast.GtE: [ast.Gt],
+    ast.And: [ast.Or],
+    ast.Or: [ast.And],
+}
+SYMBOLS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.And: "and",
+    ast.Or: "or",
+}
+
+
+def off_by(node, delta):
+    op = ast.Add() if delta > 0 else ast.Sub()
+    return ast.BinOp(left=node, op=op, right=ast.Constant(abs(delta)))
+
+
+class Mutator(ast.NodeTransformer):
+    """Walks a tree listing its mutation sites on `lines`, applying the one
+    numbered `target` if given
+    """
+
+    def __init__(self, lines, target=None):
+        self.lines = lines
+        self.target = target
+        self.sites = []
+
+    def hit(self, node, description):
+        self.sites.append(f"line {node.lineno}: {description}")
+        return len(self.sites) - 1 == self.target
+
+    def mutable(self, node):
+        return getattr(node, "lineno", None) in self.lines
+
+    def swap_op(self, node, op, set_op):
+        for alternative in SWAPS.get(type(op), ()):
+            old, new = SYMBOLS[type(op)], SYMBOLS[alternative]
+            if self.hit(node, f"{old} -> {new}"):
+                set_op(alternative())
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if self.mutable(node):
+            self.swap_op(node, node.op, lambda op: setattr(node, "op", op))
+        return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        if self.mutable(node):
+            self.swap_op(node, node.op, lambda op: setattr(node, "op", op))
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if self.mutable(node):
+            for i, op in enumerate(list(node.ops)):
+                self.swap_op(node, op, lambda new: node.ops.__setitem__(i, new))
+        return node
+
+    def visit_Constant(self, node):
+        if not self.mutable(node):
+            return node
+        if isinstance(node.value, bool):
+            if self.hit(node, f"{node.value} -> {not node.value}"):
+                return ast.Constant(not node.value)
+        elif isinstance(node.value, int):
+            for delta in (1, -1):
+                if self.hit(node, f"{node.value} -> {node.value + delta}"):
+                    return ast.Constant(node.value + delta)
+        return node
+
+    def bounds(self, node, fields):
+        """Off-by-one mutants of the sub-expressions in `fields`"""
+        for field in fields:
+            value = getattr(node, field)
+            if value is None or isinstance(value, ast.Constant):
+                continue  # constants get their own mutants
+            for delta in (1, -1):
+                text = f"{ast.unparse(value)} {'+' if delta > 0 else '-'} 1"
+                if self.hit(node, f"{ast.unparse(value)} -> {text}"):
+                    setattr(node, field, off_by(value, delta))
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if self.mutable(node) and getattr(node.func, "id", None) == "range":
+            for i, arg in enumerate(list(node.args)):
+                if isinstance(arg, ast.Constant):
+                    continue
+                for delta in (1, -1):
+                    text = f"{ast.unparse(arg)} {'+' if delta > 0 else '-'} 1"
+                    if self.hit(node, f"range bound {ast.unparse(arg)} -> {text}"):
+                        node.args[i] = off_by(arg, delta)
+        return node
+
+    def visit_Slice(self, node):
+        self.generic_visit(node)
+        if self.mutable(node):
+            self.bounds(node, ["lower", "upper"])
+        return node
+
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if not isinstance(block, list):
+                continue
+            for i in range(len(block) - 1):
+                first, second = block[i], block[i + 1]
+                if not (self.mutable(first) or self.mutable(second)):
+                    continue
+                swap = f"swap with line {second.lineno}"
+                if self.hit(first, swap):
+                    block[i], block[i + 1] = second, first
+        return node
+
+
+def target_lines(qdir, answer):
+    """Lines of `answer` at or near a blank of the question's source, or
+    every line when the question has no source
+    """
+    count = len(answer.splitlines())
+    source = source_for(qdir)
+    if not source.is_file():
+        return set(range(1, count + 1))
+    filled = set()
+    for line in parse_line_bank(source):
+        if line.blanks:
+            code = line.code
+            for blank in line.blanks:
+                code = code.replace("!BLANK", blank, 1)
+            filled.add(code)
+    lines = set()
+    for lineno, text in enumerate(answer.splitlines(), 1):
+        if split_comment(text.strip())[0] in filled:
+            lines.update(range(lineno - NEARBY, lineno + NEARBY + 1))
+    return lines
+
+
+def mutants(qdir):
+    """Yields (description, source) of each distinct mutant of the answer"""
+    answer = (Path(qdir) / ANSWER_FILE).read_text()
+    lines = target_lines(qdir, answer)
+    survey = Mutator(lines)
+    survey.visit(ast.parse(answer))
+    seen = {ast.unparse(ast.parse(answer))}
+    for target, description in enumerate(survey.sites):
+        mutator = Mutator(lines, target)
+        tree = ast.fix_missing_locations(mutator.visit(ast.parse(answer)))
+        source = ast.unparse(tree)
+        if source not in seen:
+            seen.add(source)
+            yield description, source
+
+
+def run_mutant(qdir, source, timeout):
+    """Grades a mutant up to its first failing test and returns that test's
+    name, or None if the mutant survived every test
+    """
+    try:
+        with time_limit(timeout):
+            results = worker_questions.grade(qdir, source, stop_early=True)
+    except GradingTimeout:
+        return "(timed out)"
+    if not results["tests"]:
+        return "(does not run)"
+    for test in results["tests"]:
+        if test["points"] < test["max_points"]:
+            return test["name"]
+    return None
+
+
+def analyze(qdirs, workers=None):
+    report = {}
+    pool = ProcessPoolExecutor(workers, initializer=warm_up)
+    try:
+        for qdir in qdirs:
+            qdir = str(qdir)
+            name = os.path.relpath(qdir)
+            timeout = grading_timeout(qdir)
+            answer = (Path(qdir) / ANSWER_FILE).read_text()
+            try:
+                with time_limit(timeout):
+                    baseline = grade(Question(qdir), answer)
+            except (Exception, GradingTimeout) as e:
+                report[name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            if baseline["score"] < 1.0:
+                report[name] = {"error": "the reference answer fails its own tests"}
+                continue
+            found = list(mutants(qdir))
+            jobs = [
+                pool.submit(run_mutant, qdir, source, timeout) for _, source in found
+            ]
+            survivors, killed = [], {}
+            for (description, source), job in zip(found, jobs):
+                killer = job.result()
+                if killer is None:
+                    survivors.append({"mutant": description, "source": source})
+                else:
+                    killed[killer] = killed.get(killer, 0) + 1
+            report[name] = {
+                "mutants": len(found),
+                "killed_by": killed,
+                "survivors": survivors,
+            }
+    finally:
+        # the workers ignore Ctrl-C, so the mutants not yet graded are dropped
+        pool.shutdown(cancel_futures=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument("--workers", type=int, help="Worker processes")
+    parser.add_argument("--json", help="Also write the report here")
+
+    args = parser.parse_args()
+    report = analyze(args.questions or question_dirs(), args.workers)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    for name, result in report.items():
+        if "error" in result:
+            print(f"{name}: skipped, {result['error']}")
+            continue
+        total, survived = result["mutants"], len(result["survivors"])
+        print(f"{name}: {total - survived}/{total} mutants killed")
+        for survivor in result["survivors"]:
+            print(f"  survived: {survivor['mutant']}")
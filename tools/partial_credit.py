@@ -0,0 +1,110 @@
+"""
+Scores Faded Parsons arrangements by how far they are from the reference
+ordering and indentation of the question's line bank, instead of all or
+nothing. Ordering distance is the number of lines that must be moved, added
+or removed, found with a longest increasing subsequence in O(n log n).
+
+Usage: python3 tools/partial_credit.py QUESTION SUBMISSIONS.jsonl
+Each submission is a JSON object whose "lines" are [line id, indent] pairs in
+the order submitted. The scored submissions are printed as JSON lines.
+"""
+import argparse
+import json
+import sys
+from bisect import bisect_left
+
+from fpp_source import parse_line_bank, source_for
+
+
+def longest_increasing(seq):
+    """Length of the longest strictly increasing subsequence of `seq`"""
+    tails = []
+    for x in seq:
+        i = bisect_left(tails, x)
+        if i == len(tails):
+            tails.append(x)
+        else:
+            tails[i] = x
+    return len(tails)
+
+
+class Policy:
+    """How distances turn into credit: each moved, missing or unknown line
+    costs `order_weight` and each misindented line `indent_weight`, as a
+    fraction of the bank's size
+    """
+
+    def __init__(self, order_weight=1.0, indent_weight=0.5, floor=0.0):
+        self.order_weight = order_weight
+        self.indent_weight = indent_weight
+        self.floor = floor
+
+
+class Scorer:
+    """Scores arrangements against one question's line bank"""
+
+    def __init__(self, bank, policy=None):
+        self.size = len(bank)
+        self.position = {line.id: i for i, line in enumerate(bank)}
+        self.indent = {line.id: line.indent for line in bank}
+        # given lines have their indentation set for the student
+        self.given = {line.id for line in bank if line.given is not None}
+        self.policy = policy or Policy()
+
+    def distances(self, lines):
+        """Returns (ordering distance, indentation mismatches) of `lines`"""
+        positions = []
+        seen = set()
+        unknown = mismatched = 0
+        for id, indent in lines:
+            if id not in self.position or id in seen:
+                unknown += 1
+                continue
+            seen.add(id)
+            positions.append(self.position[id])
+            if id not in self.given and indent != self.indent[id]:
+                mismatched += 1
+        moved = len(positions) - longest_increasing(positions)
+        missing = self.size - len(seen)
+        return moved + missing + unknown, mismatched
+
+    def credit(self, order, indent):
+        """The credit for an arrangement at the given distances"""
+        if not self.size:
+            return 1.0
+        penalty = (
+            self.policy.order_weight * order + self.policy.indent_weight * indent
+        ) / self.size
+        return max(self.policy.floor, 1.0 - penalty)
+
+    def score(self, lines):
+        return self.credit(*self.distances(lines))
+
+
+def scorer_for(question, policy=None):
+    return Scorer(parse_line_bank(source_for(question)), policy)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("question", help="A question directory or QUID")
+    parser.add_argument("submissions", help="A JSON lines file, or - for stdin")
+    parser.add_argument("--order-weight", type=float, default=1.0)
+    parser.add_argument("--indent-weight", type=float, default=0.5)
+    parser.add_argument("--floor", type=float, default=0.0)
+
+    args = parser.parse_args()
+    policy = Policy(args.order_weight, args.indent_weight, args.floor)
+    scorer = scorer_for(args.question, policy)
+    f = sys.stdin if args.submissions == "-" else open(args.submissions)
+    with f:
+        for line in f:
+            if not line.strip():
+                continue
+            submission = json.loads(line)
+            lines = submission["lines"]
+            order, indent = scorer.distances(lines)
+            submission["ordering_distance"] = order
+            submission["indent_mismatches"] = indent
+            submission["partial_credit"] = scorer.credit(order, indent)
+            print(json.dumps(submission))
@@ -0,0 +1,71 @@
+"""
+Local stand-in for the `code_feedback` module of PrairieLearn's python grader.
+Feedback is recorded on the class for the test that is currently running.
+"""
+import math
+import traceback
+
+
+class GradingComplete(Exception):
+    pass
+
+
+class Feedback:
+    score = None
+    buffer = []
+
+    @classmethod
+    def reset(cls):
+        cls.score = None
+        cls.buffer = []
+
+    @classmethod
+    def set_score(cls, score):
+        """Sets the fraction of the test's points earned, from 0.0 to 1.0"""
+        cls.score = max(0.0, min(1.0, float(score)))
+
+    @classmethod
+    def add_feedback(cls, text):
+        cls.buffer.append(str(text))
+
+    @classmethod
+    def finish(cls, fb_text):
+        cls.add_feedback(fb_text)
+        raise GradingComplete(fb_text)
+
+    @classmethod
+    def call_user(cls, f, *args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except Exception:
+            cls.add_feedback(traceback.format_exc())
+            cls.finish("Your code raised an Exception")
+
+    @classmethod
+    def check_scalar(
+        cls,
+        name,
+        ref,
+        data,
+        accuracy_critical=False,
+        rtol=1e-5,
+        atol=1e-8,
+        report_success=True,
+        report_failure=True,
+    ):
+        if data is None:
+            if report_failure:
+                cls.add_feedback(f"'{name}' is None or not defined")
+            return False
+        numeric = (int, float, complex)
+        if isinstance(ref, numeric) and isinstance(data, numeric):
+            good = math.isclose(data, ref, rel_tol=rtol, abs_tol=atol)
+        else:
+            good = data == ref
+        if good and report_success:
+            cls.add_feedback(f"'{name}' looks good")
+        elif not good and report_failure:
+            cls.add_feedback(f"'{name}' is inaccurate")
+        if not good and accuracy_critical:
+            cls.finish(f"'{name}' is inaccurate")
+        return good
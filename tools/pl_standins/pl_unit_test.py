@@ -0,0 +1,14 @@
+"""
+Local stand-in for the `pl_unit_test` module of PrairieLearn's python grader.
+The local grader fills in `st` and `ref` before running each test.
+"""
+import unittest
+
+
+class PLTestCase(unittest.TestCase):
+    include_plt = False
+    student_code_file = "user_code.py"
+    iter_num = 0
+    total_iters = 1
+    ref = None
+    st = None
@@ -0,0 +1,161 @@
+"""
+Derives each question's names_for_user (from its setup code) and
+names_from_user (from what its reference answer defines) and writes them to
+the question's names.json, which serverFilesCourse/fp_server.py serves.
+
+Annotated variables take their annotation as their type and annotated
+functions read like `python fn(str) -> tuple[int, int]`. Docstrings become
+descriptions.
+
+Usage: python3 tools/question_names.py [--check] [--write-shims] [QUESTION_DIR ...]
+--check compares the derived names with what each server.py generates now.
+--write-shims replaces generated server.py files with ones using fp_server.
+"""
+import argparse
+import ast
+import importlib.util
+import sys
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_server import NAMES_FILE, dump_names
+from fpp_source import question_dirs
+from local_grader import ANSWER_FILE, SETUP_FILE
+
+GENERATED = "# AUTO-GENERATED FILE"
+SHIM = """\
+# AUTO-GENERATED FILE
+# names are read from names.json by serverFilesCourse/fp_server.py
+from fp_server import generate_for
+
+generate = generate_for(__file__)
+"""
+
+
+def function_type(node):
+    args = node.args
+    params = [*args.posonlyargs, *args.args, *args.kwonlyargs]
+    if args.vararg:
+        params.append(args.vararg)
+    if args.kwarg:
+        params.append(args.kwarg)
+    if node.returns is None and all(p.annotation is None for p in params):
+        return "python function"
+
+    def annotation(arg):
+        return "any" if arg.annotation is None else ast.unparse(arg.annotation)
+
+    signature = [annotation(a) for a in [*args.posonlyargs, *args.args]]
+    if args.vararg:
+        signature.append(f"*{annotation(args.vararg)}")
+    elif args.kwonlyargs:
+        signature.append("*")
+    signature += [annotation(a) for a in args.kwonlyargs]
+    if args.kwarg:
+        signature.append(f"**{annotation(args.kwarg)}")
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"python fn({', '.join(signature)}){returns}"
+
+
+def target_names(target):
+    if isinstance(target, ast.Name):
+        yield target.id
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        for element in target.elts:
+            yield from target_names(element)
+    elif isinstance(target, ast.Starred):
+        yield from target_names(target.value)
+
+
+def defined_names(source):
+    """The top-level names `source` defines, in order, as names list dicts"""
+    names = {}
+
+    def define(name, type_, description=""):
+        if name not in names:
+            names[name] = {"name": name, "description": description, "type": type_}
+
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            doc = ast.get_docstring(node) or ""
+            define(node.name, function_type(node), doc.replace("\n", "<br>"))
+        elif isinstance(node, ast.ClassDef):
+            doc = ast.get_docstring(node) or ""
+            define(node.name, "python class", doc.replace("\n", "<br>"))
+        elif isinstance(node, ast.AnnAssign):
+            for name in target_names(node.target):
+                define(name, ast.unparse(node.annotation))
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                for name in target_names(target):
+                    define(name, "python var")
+        elif isinstance(node, ast.AugAssign):
+            for name in target_names(node.target):
+                define(name, "python var")
+    return list(names.values())
+
+
+def question_names(qdir):
+    """(names_for_user, names_from_user) of the question in `qdir`"""
+    qdir = Path(qdir)
+    setup = qdir / SETUP_FILE
+    names_for_user = defined_names(setup.read_text()) if setup.is_file() else []
+    given = {entry["name"] for entry in names_for_user}
+    names_from_user = [
+        entry
+        for entry in defined_names((qdir / ANSWER_FILE).read_text())
+        if entry["name"] not in given
+    ]
+    return names_for_user, names_from_user
+
+
+def generated_names(qdir):
+    """What the question's current server.py puts in data["params"]"""
+    server = Path(qdir) / "server.py"
+    name = "server_" + "_".join(server.resolve().parts[-3:-1])
+    spec = importlib.util.spec_from_file_location(name, server)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    params = module.generate({"params": {}})["params"]
+    return params.get("names_for_user", []), params.get("names_from_user", [])
+
+
+def is_generated(server):
+    try:
+        with open(server) as f:
+            return f.readline().rstrip() == GENERATED
+    except OSError:
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument("--check", action="store_true", help="Only compare")
+    parser.add_argument("--write-shims", action="store_true")
+
+    args = parser.parse_args()
+    mismatched = False
+    for qdir in args.questions or question_dirs():
+        qdir = Path(qdir)
+        names = question_names(qdir)
+        server = qdir / "server.py"
+        if args.check:
+            try:
+                current = generated_names(qdir)
+            except Exception as e:
+                print(f"{qdir}: skipped, server.py fails: {type(e).__name__}: {e}")
+                continue
+            if tuple(current) != names:
+                mismatched = True
+                print(f"{qdir}: derived names differ from server.py")
+            continue
+        dump_names(qdir / NAMES_FILE, *names)
+        print(f"Wrote {qdir / NAMES_FILE}")
+        if args.write_shims:
+            if not is_generated(server):
+                print(f"  left {server} alone, it isn't generated")
+                continue
+            server.write_text(SHIM)
+            print(f"  replaced {server}")
+    sys.exit(1 if mismatched else 0)
@@ -0,0 +1,94 @@
+"""
+Regrades recorded submissions, rerunning only the tests whose results can't
+be reused from earlier grading. Each test's result is cached under a hash of
+the test method's source (and the rest of the test file), the submission, the
+reference answer and the files the tests run with (the question's res/ data,
+its *_test.json spec, the grader stand-ins and serverFilesCourse/), so after
+an instructor edits one test only that test runs again, and the other tests'
+points are merged into the new scores.
+
+Usage: python3 tools/regrade.py [--cache FILE] [--out FILE] SUBMISSIONS.jsonl [...]
+
+Submissions are JSON lines with "question" (a question directory or QUID) and
+"source", as for tools/load_test.py; other keys are kept. Each is written out
+with its new "score" and "tests".
+"""
+import argparse
+import json
+import sqlite3
+import sys
+
+from analytics import read_results
+from fpp_source import COURSE_ROOT
+from local_grader import Question, grade, resolve_question
+
+DEFAULT_CACHE = COURSE_ROOT / ".result-cache.sqlite3"
+
+
+class ResultCache:
+    """Test results in SQLite, keyed by Question.result_key. Counts the
+    results it finds and misses.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        # several grading processes may share one cache
+        self.db = sqlite3.connect(str(path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT result FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put_many(self, results):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?)",
+                ((key, json.dumps(result)) for key, result in results.items()),
+            )
+
+    def close(self):
+        self.db.close()
+
+
+def regrade(submissions, cache, out):
+    questions = {}
+    for submission in submissions:
+        qdir = resolve_question(submission["question"])
+        if qdir not in questions:
+            questions[qdir] = Question(qdir)
+        results = grade(questions[qdir], submission["source"], cache=cache)
+        submission.update(score=results["score"], tests=results["tests"])
+        out.write(json.dumps(submission) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("submissions", nargs="+", help="Submission logs (or -)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Result cache")
+    parser.add_argument("--out", help="Write regraded submissions here")
+
+    args = parser.parse_args()
+    cache = ResultCache(args.cache)
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        regrade(read_results(args.submissions), cache, out)
+    finally:
+        if args.out:
+            out.close()
+        cache.close()
+    total = cache.hits + cache.misses
+    print(
+        f"Reran {cache.misses} of {total} tests, reused {cache.hits}",
+        file=sys.stderr,
+    )
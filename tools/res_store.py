@@ -0,0 +1,191 @@
+"""
+Writes the `## res/... ##` regions of question sources into a content-addressed
+store and links them into each question's res/ directory, so a resource shared
+by many questions is stored once and only rewritten when its contents change.
+
+Usage: python3 tools/res_store.py [--store DIR] [--prune | --check] [SOURCE ...]
+
+With --check, nothing is written, and the exit status is 1 if any res/ file
+differs from its region.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_atomic import atomic_path
+from fpp_source import (
+    COURSE_ROOT,
+    iter_regions,
+    question_dir,
+    question_sources,
+    resource_path,
+)
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+DEFAULT_STORE = COURSE_ROOT / ".res-store"
+# linux ioctl to share a file's extents copy-on-write (btrfs, xfs, ...)
+FICLONE = 0x40049409
+CHUNK_SIZE = 1 << 16
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(store, digest):
+    return Path(store) / digest[:2] / digest
+
+
+def store_body(store, body):
+    """Streams the lines of a region `body` into the store and returns the
+    path of its blob. Nothing is written if the blob already exists.
+    """
+    store = Path(store)
+    store.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=store, prefix=".incoming-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            separator = b""
+            for line in body:
+                chunk = separator + line.encode()
+                digest.update(chunk)
+                f.write(chunk)
+                separator = b"\n"
+        blob = blob_path(store, digest.hexdigest())
+        if blob.exists():
+            os.unlink(tmp)
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            # blobs are shared through hardlinks, so keep them read-only
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, blob)
+        return blob
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def reflink(src, dst):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def place(blob, target):
+    """Points `target` at `blob` with a hardlink, falling back to a reflink
+    and then a plain copy. Returns which of the three was used.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(target) as tmp:
+        try:
+            os.link(blob, tmp)
+            method = "linked"
+        except OSError:
+            try:
+                reflink(blob, tmp)
+                method = "reflinked"
+            except OSError:
+                if tmp.exists():
+                    tmp.unlink()
+                shutil.copyfile(blob, tmp)
+                method = "copied"
+    return method
+
+
+def sync_resource(blob, target):
+    if target.exists():
+        if os.path.samefile(blob, target):
+            return "unchanged"
+        if file_digest(target) == blob.name:
+            # same contents under another inode, so only swap in the blob
+            # when that avoids a second copy
+            try:
+                with atomic_path(target) as tmp:
+                    os.link(blob, tmp)
+            except OSError:
+                return "unchanged"
+            return "linked"
+    return place(blob, target)
+
+
+def sync_source(source, store=DEFAULT_STORE):
+    """Stores every resource of `source` and links it into the question
+    directory. Returns a list of (path, status) pairs.
+    """
+    qdir = question_dir(source)
+    results = []
+    with open(source, encoding="utf-8") as f:
+        for name, body in iter_regions(f):
+            if name is None or not name.startswith("res/"):
+                continue
+            blob = store_body(store, body)
+            target = qdir / resource_path(name)
+            results.append((target, sync_resource(blob, target)))
+    return results
+
+
+def check_source(source):
+    """Returns the res/ files of `source` that are missing or differ from
+    their regions, without writing anything
+    """
+    qdir = question_dir(source)
+    stale = []
+    with open(source, encoding="utf-8") as f:
+        for name, body in iter_regions(f):
+            if name is None or not name.startswith("res/"):
+                continue
+            digest = hashlib.sha256("\n".join(body).encode()).hexdigest()
+            target = qdir / resource_path(name)
+            if not target.is_file() or file_digest(target) != digest:
+                stale.append(target)
+    return stale
+
+
+def prune(store=DEFAULT_STORE):
+    """Removes blobs no question hardlinks to anymore"""
+    removed = 0
+    for blob in Path(store).glob("??/*"):
+        if blob.stat().st_nlink == 1:
+            blob.unlink()
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sources", nargs="*", help="Question sources to sync")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="Store directory")
+    parser.add_argument(
+        "--prune", action="store_true", help="Remove blobs no longer linked"
+    )
+    parser.add_argument("--check", action="store_true", help="Only compare")
+
+    args = parser.parse_args()
+    if args.check:
+        stale = []
+        for source in args.sources or question_sources():
+            stale += check_source(source)
+        for target in stale:
+            print(f"    stale: {os.path.relpath(target)}")
+        sys.exit(1 if stale else 0)
+    for source in args.sources or question_sources():
+        for target, status in sync_source(source, args.store):
+            print(f"{status:>9}: {os.path.relpath(target)}")
+    if args.prune:
+        print(f"Pruned {prune(args.store)} unused blob(s)")
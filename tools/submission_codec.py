@@ -0,0 +1,122 @@
+"""
+Converts logs of full-source submissions to the compact encoding of
+serverFilesCourse/fp_codec.py and back. Decoding rebuilds each submission's
+exact source, so decoded logs can be graded as before (eg by
+tools/regrade.py or tools/load_test.py).
+
+Usage: python3 tools/submission_codec.py encode [--out FILE] LOG.jsonl [...]
+       python3 tools/submission_codec.py decode [--out FILE] LOG.fps
+
+Logs are JSON lines with "question" (a question directory or QUID) and
+"source"; other keys are kept alongside each encoded submission. An encoded
+log is MAGIC followed by one record per submission:
+    question    interned as in fp_codec.py, across the log; the first
+                record of each question is followed by its line bank digest
+    keys        the length and compact JSON of the other keys
+    submission  as in fp_codec.py, interning strings per question
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+from pathlib import Path
+
+from analytics import read_results
+from fp_codec import LineBank, Strings, read_varint, write_varint
+from fpp_source import QUESTIONS_DIR, parse_line_bank, source_for
+
+MAGIC = b"FPS1"
+FLUSH_BYTES = 1 << 16
+
+
+@functools.lru_cache(maxsize=None)
+def bank_for(question):
+    """The question's line bank, which is empty (every line is kept as text)
+    when the question has no source
+    """
+    qdir = Path(question)
+    if qdir.is_dir():
+        question = os.path.relpath(qdir.resolve(), QUESTIONS_DIR)
+    source = source_for(question)
+    bank = parse_line_bank(source) if source.is_file() else []
+    return LineBank(line.code for line in bank)
+
+
+def encode_log(submissions, out):
+    """Writes `submissions` to the binary file `out` and returns how many"""
+    out.write(MAGIC)
+    questions = Strings()
+    strings = {}
+    buffer = bytearray()
+    count = 0
+    for submission in submissions:
+        question = str(submission.pop("question"))
+        bank = bank_for(question)
+        questions.write(buffer, question)
+        if question not in strings:
+            strings[question] = Strings()
+            buffer += bank.digest
+        source = submission.pop("source")
+        keys = json.dumps(submission, separators=(",", ":")).encode()
+        write_varint(buffer, len(keys))
+        buffer += keys
+        bank.encode(source, strings[question], buffer)
+        count += 1
+        if len(buffer) >= FLUSH_BYTES:
+            out.write(buffer)
+            buffer.clear()
+    out.write(buffer)
+    return count
+
+
+def decode_log(data):
+    """Yields the submissions of an encoded log as dicts with "source" """
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("not an encoded submission log")
+    pos = len(MAGIC)
+    questions = Strings()
+    strings = {}
+    while pos < len(data):
+        question, pos = questions.read(data, pos)
+        bank = bank_for(question)
+        if question not in strings:
+            strings[question] = Strings()
+            if data[pos : pos + len(bank.digest)] != bank.digest:
+                raise ValueError(f"the line bank of {question} has changed")
+            pos += len(bank.digest)
+        n, pos = read_varint(data, pos)
+        submission = json.loads(data[pos : pos + n])
+        source, pos = bank.decode(data, pos + n, strings[question])
+        yield {"question": question, **submission, "source": source}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    encode = commands.add_parser("encode", help="Encode full-source logs")
+    encode.add_argument("logs", nargs="+", help="Submission logs (.jsonl, .gz or -)")
+    encode.add_argument("--out", help="The encoded log (default stdout)")
+    decode = commands.add_parser("decode", help="Rebuild a full-source log")
+    decode.add_argument("log", help="An encoded log")
+    decode.add_argument("--out", help="The JSON lines log (default stdout)")
+
+    args = parser.parse_args()
+    if args.command == "encode":
+        if args.out:
+            with open(args.out, "wb") as out:
+                count = encode_log(read_results(args.logs), out)
+            size = os.path.getsize(args.out)
+            print(f"Encoded {count} submissions in {size} bytes", file=sys.stderr)
+        else:
+            encode_log(read_results(args.logs), sys.stdout.buffer)
+    else:
+        with open(args.log, "rb") as f:
+            data = f.read()
+        out = open(args.out, "w") if args.out else sys.stdout
+        try:
+            for submission in decode_log(data):
+                out.write(json.dumps(submission) + "\n")
+        finally:
+            if args.out:
+                out.close()
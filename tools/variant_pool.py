@@ -0,0 +1,79 @@
+"""
+Runs each question's generate(data) ahead of time for a range of seeds and
+stores the results in the question's variant_pool.json, which server.py
+serves from when its generate is decorated with fp_variants.pooled.
+
+Usage: python3 tools/variant_pool.py [--seeds N] [QUESTION_DIR ...]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import fpp_source  # noqa: F401 puts serverFilesCourse on the path
+from fp_variants import POOL_NAME, VariantPool, server_hash
+from fpp_source import question_dirs
+
+DEFAULT_SEEDS = 100
+
+
+def load_server(qdir):
+    server = Path(qdir) / "server.py"
+    name = "server_" + "_".join(Path(qdir).resolve().parts[-2:])
+    spec = importlib.util.spec_from_file_location(name, server)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed(seed)
+
+
+def build_pool(qdir, seeds=DEFAULT_SEEDS):
+    """Generates `seeds` variants of the question in `qdir`"""
+    server = load_server(qdir)
+    # bypass a pool that may be left over from an older server.py
+    generate = getattr(server.generate, "live", server.generate)
+    variants, seen, indices = [], {}, []
+    for seed in range(seeds):
+        seed_everything(seed)
+        data = {"params": {}, "correct_answers": {}, "variant_seed": seed}
+        data = generate(data) or data
+        variant = {
+            "params": data["params"],
+            "correct_answers": data.get("correct_answers", {}),
+        }
+        key = json.dumps(variant, sort_keys=True)
+        if key not in seen:
+            seen[key] = len(variants)
+            variants.append(variant)
+        indices.append(seen[key])
+    return VariantPool(server_hash(Path(qdir) / "server.py"), variants, indices)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", nargs="*", help="Question directories")
+    parser.add_argument("--seeds", type=int, default=DEFAULT_SEEDS)
+
+    args = parser.parse_args()
+    for qdir in args.questions or question_dirs():
+        if not (Path(qdir) / "server.py").is_file():
+            continue
+        try:
+            pool = build_pool(qdir, args.seeds)
+        except Exception as e:
+            print(f"Skipped {os.path.relpath(qdir)}: {type(e).__name__}: {e}")
+            continue
+        pool.dump(Path(qdir) / POOL_NAME)
+        print(
+            f"Pooled {os.path.relpath(qdir)}: {len(pool)} seeds, "
+            f"{len(pool.variants)} distinct variant(s)"
+        )
@@ -0,0 +1,327 @@
+"""
+Works out what to regenerate and check for a set of changed paths, from a
+dependency graph of question sources, the specs and files they import, the
+files generated from them and the validators that read them, then runs the
+jobs in parallel.
+
+    questions/<quid>.py, files it imports   -> regenerate <quid>
+    questions/<quid>_test.json              -> regenerate (or grade) <quid>
+    regenerate <quid>                       -> grade <quid>, check its info.json
+    questions/<quid>/tests/...              -> rebundle <quid>, grade <quid>
+    questions/<quid>/...                    -> grade <quid>
+    course JSON files                       -> schema check (and info check)
+    infoCourse.json                         -> info check of every question
+    serverFilesCourse/, grader stand-ins    -> grade every question
+    validators and schemas                  -> rerun them on every file
+
+QUIDs may be nested, eg questions/lists/sublist/, and a source's imports are
+relative to its own directory. Regenerating runs $FPP_GENERATOR on the source
+when it is set, then the course tools that keep generated files in sync
+(resources, and names.json for questions that have one). Questions with a
+tests/question.fpb are rebundled.
+
+With --check (as in validate_changed_files), nothing is written: the
+generator isn't run, and generated files and bundles are only compared with
+their sources, as graders only skip bundles older than them. Questions listed
+in stub_questions.txt aren't graded, nor are questions whose tests need a
+module that isn't installed.
+
+Usage: python3 validation_workflow/changed_jobs.py [--staged | --since REF]
+                                                   [--check] [--dry-run]
+                                                   [--workers N] [PATH ...]
+"""
+import argparse
+import os
+import posixpath
+import re
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from schema_check import course_files, schema_for
+
+PYTHON = sys.executable
+IMPORT = re.compile(r"^## import (\S+) as \S+ ##")
+# a question's declarative test spec, read when generating and grading it
+SPEC = re.compile(r"questions/(.+)_test\.json")
+# a change to any of these is a change to every question's grading
+GRADING_PATHS = ("serverFilesCourse/", "tools/pl_standins/", "tools/local_grader.py")
+SCHEMA_PATHS = ("validation_workflow/schemas/", "validation_workflow/schema_check.py")
+INFO_CHECKER = "validation_workflow/info_json_check.py"
+STUBS_FILE = "validation_workflow/stub_questions.txt"
+BUNDLE_FILE = "tests/question.fpb"
+# exit status of a job that can't run here, as from local_grader.py --check
+SKIPPED = 77
+
+
+def read_stubs(root="."):
+    """The QUIDs in STUBS_FILE, one a line, with # comments"""
+    try:
+        with open(Path(root) / STUBS_FILE, encoding="utf-8") as f:
+            lines = [line.split("#")[0].strip() for line in f]
+    except FileNotFoundError:
+        return set()
+    return {line for line in lines if line}
+
+
+class Graph:
+    """The dependents of paths and jobs in the course at `root`, which is
+    the working directory. Nodes are paths relative to it, or jobs like
+    ("grade", quid).
+    """
+
+    def __init__(self, root="."):
+        self.root = Path(root)
+        questions = self.root / "questions"
+        self.quids = sorted(
+            info.parent.relative_to(questions).as_posix()
+            for info in questions.rglob("info.json")
+        )
+        self._quids = set(self.quids)
+        # imported file -> the QUIDs of the sources importing it
+        self.importers = {}
+        for source in sorted(questions.rglob("*.py")):
+            node = source.relative_to(self.root).as_posix()
+            if self.quid_of(node) is not None:
+                continue  # a file of a question, eg its server.py
+            with open(source, encoding="utf-8") as f:
+                for line in f:
+                    found = IMPORT.match(line)
+                    if found:
+                        imported = posixpath.normpath(
+                            posixpath.join(posixpath.dirname(node), found.group(1))
+                        )
+                        quid = node[len("questions/") : -len(".py")]
+                        self.importers.setdefault(imported, set()).add(quid)
+
+    def quid_of(self, node):
+        """The QUID of the question directory holding the path `node`"""
+        parts = node.split("/")
+        if parts[0] != "questions":
+            return None
+        for end in range(len(parts) - 1, 1, -1):
+            quid = "/".join(parts[1:end])
+            if quid in self._quids:
+                return quid
+        return None
+
+    def has_bundle(self, quid):
+        return (self.root / "questions" / quid / BUNDLE_FILE).is_file()
+
+    def info_files(self):
+        return [f"questions/{quid}/info.json" for quid in self.quids]
+
+    def dependents(self, node):
+        if isinstance(node, tuple):
+            kind, quid = node
+            if kind == "generate":
+                info = f"questions/{quid}/info.json"
+                found = {("grade", quid), ("schema", info), ("info", info)}
+                if self.has_bundle(quid):
+                    found.add(("bundle", quid))
+                return found
+            return set()
+
+        found = set()
+        if node.endswith(".json") and schema_for(self.root / node):
+            found.add(("schema", node))
+        for quid in self.importers.get(node, ()):
+            found.add(("generate", quid))
+        spec = SPEC.fullmatch(node)
+        quid = self.quid_of(node)
+        if spec and quid is None:
+            quid = spec.group(1)
+            if (self.root / "questions" / f"{quid}.py").is_file():
+                found.add(("generate", quid))
+            elif quid in self._quids:
+                found.add(("grade", quid))
+        elif quid is not None:
+            rel = node[len(f"questions/{quid}/") :]
+            if rel == "info.json":
+                found.add(("info", node))
+            elif rel != BUNDLE_FILE:
+                found.add(("grade", quid))
+                if rel.startswith("tests/") and self.has_bundle(quid):
+                    found.add(("bundle", quid))
+        elif node.startswith("questions/") and node.endswith(".py"):
+            found.add(("generate", node[len("questions/") : -len(".py")]))
+        elif node == "infoCourse.json":
+            found.update(("info", info) for info in self.info_files())
+        elif node == INFO_CHECKER:
+            found.update(("info", info) for info in self.info_files())
+        elif node.startswith(SCHEMA_PATHS):
+            found.update(("schema", path) for path in course_files(self.root))
+        elif node.startswith(GRADING_PATHS):
+            found.update(("grade", quid) for quid in self.quids)
+        return found
+
+    def affected(self, changed):
+        """Every job reachable from the changed paths"""
+        seen = set()
+        stack = [Path(os.path.normpath(path)).as_posix() for path in changed]
+        while stack:
+            for dependent in self.dependents(stack.pop()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return seen
+
+
+class Job:
+    def __init__(self, name, commands, after=(), skip=None):
+        self.name = name
+        self.commands = commands
+        self.after = set(after)
+        # why the job isn't run, if it isn't
+        self.skip = skip
+
+
+def generate_commands(root, quid, check=False):
+    qdir = f"questions/{quid}"
+    source = f"questions/{quid}.py"
+    commands = []
+    if os.environ.get("FPP_GENERATOR") and not check:
+        commands.append(shlex.split(os.environ["FPP_GENERATOR"]) + [source])
+    flags = ["--check"] if check else []
+    commands.append([PYTHON, "tools/res_store.py", *flags, source])
+    if (Path(root) / qdir / "names.json").is_file():
+        commands.append([PYTHON, "tools/question_names.py", *flags, qdir])
+    return commands
+
+
+def plan(nodes, root=".", check=False):
+    """Batches affected jobs into the Jobs to run, by name. With `check`,
+    no job writes files.
+    """
+    jobs = {}
+    generated = sorted(quid for kind, quid in nodes if kind == "generate")
+    for quid in generated:
+        name = f"generate {quid}"
+        jobs[name] = Job(name, generate_commands(root, quid, check))
+    bundled = {quid for kind, quid in nodes if kind == "bundle"}
+    flags = ["--check"] if check else []
+    for quid in sorted(bundled):
+        command = [PYTHON, "tools/bundle.py", *flags, f"questions/{quid}"]
+        after = [f"generate {quid}"] if quid in generated else []
+        jobs[f"bundle {quid}"] = Job(f"bundle {quid}", [command], after)
+    stubs = read_stubs(root)
+    for quid in sorted(quid for kind, quid in nodes if kind == "grade"):
+        command = [PYTHON, "tools/local_grader.py", "--check", f"questions/{quid}"]
+        after = [f"generate {quid}"] if quid in generated else []
+        after += [f"bundle {quid}"] if quid in bundled else []
+        skip = f"its tests are stubs (see {STUBS_FILE})" if quid in stubs else None
+        jobs[f"grade {quid}"] = Job(f"grade {quid}", [command], after, skip)
+    # every generate job may rewrite JSON, so file checks wait for them all
+    after = [f"generate {quid}" for quid in generated]
+    schema = sorted(path for kind, path in nodes if kind == "schema")
+    if schema:
+        command = [PYTHON, "validation_workflow/schema_check.py", *schema]
+        jobs["schema check"] = Job("schema check", [command], after)
+    info = sorted(path for kind, path in nodes if kind == "info")
+    if info:
+        command = [PYTHON, INFO_CHECKER, "--inputs", *info]
+        jobs["info check"] = Job("info check", [command], after)
+    return jobs
+
+
+def run_job(job, root):
+    start = time.perf_counter()
+    output = []
+    for command in job.commands:
+        proc = subprocess.run(
+            command,
+            cwd=root,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        output.append(proc.stdout)
+        if proc.returncode == SKIPPED:
+            return "SKIP", "".join(output), time.perf_counter() - start
+        if proc.returncode != 0:
+            return "FAIL", "".join(output), time.perf_counter() - start
+    return "PASS", "".join(output), time.perf_counter() - start
+
+
+def run(jobs, root=".", workers=None):
+    """Runs each job once the jobs it comes after have passed, and returns
+    the names of the jobs that failed or were skipped
+    """
+    done, failed = set(), set()
+    pending = dict(jobs)
+    running = {}
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        while pending or running:
+            for name, job in list(pending.items()):
+                if job.after & failed:
+                    print(f"SKIP {name}: needs {', '.join(sorted(job.after & failed))}")
+                    failed.add(name)
+                    del pending[name]
+                elif job.skip is not None:
+                    print(f"SKIP {name}: {job.skip}")
+                    done.add(name)
+                    del pending[name]
+                elif job.after <= done:
+                    running[pool.submit(run_job, job, root)] = name
+                    del pending[name]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                status, output, seconds = future.result()
+                print(f"{status} {name} ({seconds:.1f}s)")
+                if status == "FAIL":
+                    failed.add(name)
+                    print(output.rstrip())
+                else:
+                    done.add(name)
+                    if status == "SKIP":
+                        print(output.rstrip())
+    return failed
+
+
+def git_paths(*args):
+    proc = subprocess.run(
+        ["git", "diff", "--name-only", "--diff-filter=d", *args],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return proc.stdout.split()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="*", help="Changed paths")
+    parser.add_argument("--staged", action="store_true", help="Use staged changes")
+    parser.add_argument("--since", help="Use changes since this commit")
+    parser.add_argument("--check", action="store_true", help="Write no files")
+    parser.add_argument("--dry-run", action="store_true", help="Only print jobs")
+    parser.add_argument("--workers", type=int, help="Jobs run at once")
+
+    args = parser.parse_args()
+    paths = list(args.paths)
+    if args.staged:
+        paths += git_paths("--staged", "HEAD")
+    if args.since:
+        paths += git_paths(f"{args.since}...HEAD")
+
+    jobs = plan(Graph().affected(paths), check=args.check)
+    if not jobs:
+        print("No files need to be checked!")
+        sys.exit(0)
+    if args.dry_run:
+        for job in jobs.values():
+            after = f" (after {', '.join(sorted(job.after))})" if job.after else ""
+            print(f"{job.name}{after}")
+            if job.skip is not None:
+                print(f"    skipped, {job.skip}")
+                continue
+            for command in job.commands:
+                print(f"    {shlex.join(command)}")
+        sys.exit(0)
+    sys.exit(1 if run(jobs, workers=args.workers) else 0)
@@ -0,0 +1,418 @@
+"""
+Validates every course JSON file against the schemas in
+validation_workflow/schemas. Each schema is compiled once into the source of
+a Python validator, whose bytecode is cached in .schema-cache/ until the
+schemas or this file change, and files are checked in parallel. Errors are
+reported with the JSON pointer of the offending value.
+
+Usage: python3 validation_workflow/schema_check.py [--workers N] [FILE ...]
+All course JSON files are checked when no files are given. A file given that
+no schema is for is an error.
+"""
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+COURSE_ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_DIR = COURSE_ROOT / "validation_workflow" / "schemas"
+CACHE_DIR = COURSE_ROOT / ".schema-cache"
+# the schema for each course file, by glob relative to the course root,
+# where ** matches any number of directories (for nested QUIDs)
+FILE_SCHEMAS = [
+    ("infoCourse.json", "infoCourse"),
+    ("courseInstances/*/infoCourseInstance.json", "infoCourseInstance"),
+    ("courseInstances/*/assessments/**/infoAssessment.json", "infoAssessment"),
+    ("questions/**/tests/test_source.json", "test_spec"),
+    ("questions/**/info.json", "info"),
+    ("questions/**/*_test.json", "test_spec"),
+]
+# below this many files, checking in this process beats starting workers
+PARALLEL_MIN = 64
+# keywords that describe a schema without constraining it
+ANNOTATIONS = {"$comment", "$schema", "$id", "title", "description", "default"}
+TYPES = {
+    "object": ("isinstance(value, dict)", "an object"),
+    "array": ("isinstance(value, list)", "an array"),
+    "string": ("isinstance(value, str)", "a string"),
+    "integer": (
+        "isinstance(value, int) and not isinstance(value, bool)",
+        "an integer",
+    ),
+    "number": (
+        "isinstance(value, (int, float)) and not isinstance(value, bool)",
+        "a number",
+    ),
+    "boolean": ("isinstance(value, bool)", "a boolean"),
+    "null": ("value is None", "null"),
+}
+
+
+def escape(key):
+    """A key as a JSON pointer reference token"""
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def choose(pointer, attempts):
+    """The errors to report when no branch of an anyOf matched: those of
+    the branch that got furthest, preferring branches of the right type
+    """
+
+    def distance(errors):
+        wrong_type = any(p == pointer and m.startswith("must be ") for p, m in errors)
+        return wrong_type, len(errors)
+
+    return min(attempts, key=distance)
+
+
+class Compiler:
+    """Writes each schema node as a function `_vN(value, pointer, errors)`
+    that appends (pointer, message) pairs to `errors`
+    """
+
+    def __init__(self, schema_dir=SCHEMA_DIR):
+        self.schema_dir = Path(schema_dir)
+        self.documents = {}
+        self.functions = []
+        self.constants = []
+        self.refs = {}
+
+    def document(self, name):
+        if name not in self.documents:
+            with open(self.schema_dir / name) as f:
+                self.documents[name] = json.load(f)
+        return self.documents[name]
+
+    def constant(self, expression):
+        self.constants.append(expression)
+        return f"_c{len(self.constants) - 1}"
+
+    def resolve(self, ref, document):
+        name, _, fragment = ref.partition("#")
+        name = name or document
+        node = self.document(name)
+        for token in filter(None, fragment.split("/")):
+            node = node[token.replace("~1", "/").replace("~0", "~")]
+        return name, node
+
+    def ref(self, ref, document):
+        name, node = self.resolve(ref, document)
+        key = (name, ref.partition("#")[2])
+        if key not in self.refs:
+            # named before compiling so recursive schemas refer back to it
+            self.refs[key] = f"_v{len(self.functions)}"
+            self.functions.append(None)
+            self.node(node, name, self.refs[key])
+        return self.refs[key]
+
+    def node(self, schema, document, name=None):
+        """Compiles `schema` and returns its function's name"""
+        if name is None:
+            name = f"_v{len(self.functions)}"
+            self.functions.append(None)
+        index = int(name[2:])
+        unknown = set(schema) - ANNOTATIONS - {"definitions"} - set(KEYWORDS)
+        if unknown:
+            raise ValueError(f"Unsupported schema keywords {sorted(unknown)}")
+        body = []
+        for keyword, write in KEYWORDS.items():
+            if keyword in schema:
+                body += write(self, schema, document)
+        lines = [f"def {name}(value, pointer, errors):"]
+        lines += [f"    {line}" for line in body] or ["    pass"]
+        self.functions[index] = "\n".join(lines)
+        return name
+
+    def source(self, schema_name):
+        entry = self.node(self.document(f"{schema_name}.json"), f"{schema_name}.json")
+        constants = [f"_c{i} = {c}" for i, c in enumerate(self.constants)]
+        return "\n\n".join(
+            ["import re", "\n".join(constants), *self.functions, f"validate = {entry}"]
+        )
+
+
+def _ref(compiler, schema, document):
+    return [f"{compiler.ref(schema['$ref'], document)}(value, pointer, errors)"]
+
+
+def _type(compiler, schema, document):
+    types = schema["type"]
+    types = [types] if isinstance(types, str) else types
+    check = " or ".join(f"({TYPES[t][0]})" for t in types)
+    names = " or ".join(TYPES[t][1] for t in types)
+    return [
+        f"if not ({check}):",
+        f"    errors.append((pointer, {f'must be {names}'!r}))",
+        "    return",
+    ]
+
+
+def _enum(compiler, schema, document):
+    options = compiler.constant(repr(schema["enum"]))
+    message = "must be one of " + ", ".join(json.dumps(o) for o in schema["enum"])
+    return [
+        f"if value not in {options}:",
+        f"    errors.append((pointer, {message!r}))",
+    ]
+
+
+def _const(compiler, schema, document):
+    message = f"must be {json.dumps(schema['const'])}"
+    return [
+        f"if value != {schema['const']!r}:",
+        f"    errors.append((pointer, {message!r}))",
+    ]
+
+
+def _pattern(compiler, schema, document):
+    pattern = compiler.constant(f"re.compile({schema['pattern']!r})")
+    message = f"must match {schema['pattern']}"
+    return [
+        f"if isinstance(value, str) and not {pattern}.search(value):",
+        f"    errors.append((pointer, {message!r}))",
+    ]
+
+
+def _min_length(compiler, schema, document):
+    n = schema["minLength"]
+    message = "must not be empty" if n == 1 else f"must be at least {n} characters"
+    return [
+        f"if isinstance(value, str) and len(value) < {n}:",
+        f"    errors.append((pointer, {message!r}))",
+    ]
+
+
+def _bound(keyword, op, message):
+    def write(compiler, schema, document):
+        bound = schema[keyword]
+        return [
+            "if isinstance(value, (int, float)) and not isinstance(value, bool)"
+            f" and value {op} {bound!r}:",
+            f"    errors.append((pointer, {f'{message} {bound}'!r}))",
+        ]
+
+    return write
+
+
+def _required(compiler, schema, document):
+    lines = ["if isinstance(value, dict):"]
+    for key in schema["required"]:
+        message = f"missing required property {key!r}"
+        lines += [
+            f"    if {key!r} not in value:",
+            f"        errors.append((pointer, {message!r}))",
+        ]
+    return lines
+
+
+def _properties(compiler, schema, document):
+    lines = ["if isinstance(value, dict):"]
+    for key, subschema in schema["properties"].items():
+        check = compiler.node(subschema, document)
+        lines += [
+            f"    if {key!r} in value:",
+            f"        {check}(value[{key!r}], pointer + {'/' + escape(key)!r}, errors)",
+        ]
+    return lines
+
+
+def _additional_properties(compiler, schema, document):
+    extra = schema["additionalProperties"]
+    known = compiler.constant(repr(frozenset(schema.get("properties", {}))))
+    lines = [
+        "if isinstance(value, dict):",
+        "    for key in value:",
+        f"        if key in {known}:",
+        "            continue",
+        "        at = pointer + '/' + key.replace('~', '~0').replace('/', '~1')",
+    ]
+    if extra is False:
+        return lines + ["        errors.append((at, 'is not an allowed property'))"]
+    if extra is True:
+        return []
+    return lines + [f"        {compiler.node(extra, document)}(value[key], at, errors)"]
+
+
+def _items(compiler, schema, document):
+    check = compiler.node(schema["items"], document)
+    return [
+        "if isinstance(value, list):",
+        "    for i, item in enumerate(value):",
+        f"        {check}(item, f'{{pointer}}/{{i}}', errors)",
+    ]
+
+
+def _min_items(compiler, schema, document):
+    n = schema["minItems"]
+    message = "must not be empty" if n == 1 else f"must have at least {n} items"
+    return [
+        f"if isinstance(value, list) and len(value) < {n}:",
+        f"    errors.append((pointer, {message!r}))",
+    ]
+
+
+def _any_of(compiler, schema, document):
+    checks = ", ".join(compiler.node(s, document) for s in schema["anyOf"])
+    return [
+        "attempts = []",
+        f"for check in ({checks},):",
+        "    attempt = []",
+        "    check(value, pointer, attempt)",
+        "    if not attempt:",
+        "        break",
+        "    attempts.append(attempt)",
+        "else:",
+        "    errors.extend(_choose(pointer, attempts))",
+    ]
+
+
+def _all_of(compiler, schema, document):
+    return [
+        f"{compiler.node(s, document)}(value, pointer, errors)" for s in schema["allOf"]
+    ]
+
+
+# in the order their checks run. A failed type check skips the rest.
+KEYWORDS = {
+    "$ref": _ref,
+    "type": _type,
+    "enum": _enum,
+    "const": _const,
+    "pattern": _pattern,
+    "minLength": _min_length,
+    "minimum": _bound("minimum", "<", "must be at least"),
+    "maximum": _bound("maximum", ">", "must be at most"),
+    "required": _required,
+    "properties": _properties,
+    "additionalProperties": _additional_properties,
+    "items": _items,
+    "minItems": _min_items,
+    "anyOf": _any_of,
+    "allOf": _all_of,
+}
+
+
+def schemas_digest(schema_dir=SCHEMA_DIR):
+    """Changes with the schemas, this compiler and the bytecode format"""
+    digest = hashlib.sha256(sys.implementation.cache_tag.encode())
+    digest.update(Path(__file__).read_bytes())
+    for path in sorted(Path(schema_dir).glob("*.json")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def compiled(schema_name, cache_dir=CACHE_DIR):
+    """The bytecode of a schema's validator module, compiled or cached"""
+    cache = Path(cache_dir) / f"{schema_name}.{schemas_digest()}.marshal"
+    try:
+        with open(cache, "rb") as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    source = Compiler().source(schema_name)
+    code = compile(source, f"<schema {schema_name}>", "exec")
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_name(f".{cache.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            marshal.dump(code, f)
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # a read-only checkout still validates, just uncached
+    return code
+
+
+_validators = {}
+
+
+def validator(schema_name, cache_dir=CACHE_DIR):
+    if schema_name not in _validators:
+        namespace = {"_choose": choose}
+        exec(compiled(schema_name, cache_dir), namespace)
+        _validators[schema_name] = namespace["validate"]
+    return _validators[schema_name]
+
+
+def glob_pattern(glob):
+    parts = re.split(r"(\*\*/|\*)", glob)
+    regex = {"**/": "(?:[^/]+/)*", "*": "[^/]*"}
+    return re.compile("".join(regex.get(part, re.escape(part)) for part in parts))
+
+
+FILE_PATTERNS = [(glob_pattern(glob), name) for glob, name in FILE_SCHEMAS]
+
+
+def schema_for(path):
+    """The name of the schema for the file at `path`, or None"""
+    try:
+        rel = Path(path).resolve().relative_to(COURSE_ROOT).as_posix()
+    except ValueError:  # outside the course
+        return None
+    for pattern, schema_name in FILE_PATTERNS:
+        if pattern.fullmatch(rel):
+            return schema_name
+    return None
+
+
+def course_files(root=COURSE_ROOT):
+    """Every course JSON file that has a schema"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            path = os.path.relpath(os.path.join(dirpath, filename))
+            if filename.endswith(".json") and schema_for(path):
+                yield path
+
+
+def check_file(path):
+    """Returns the (pointer, message) errors of one file"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+    except json.JSONDecodeError as e:
+        return [("", f"is not valid JSON: {e}")]
+    except OSError as e:
+        return [("", f"could not be read: {e.strerror}")]
+    errors = []
+    validator(schema_for(path))(document, "", errors)
+    return errors
+
+
+def check_files(paths, workers=None):
+    """Maps each path with errors to its errors"""
+    paths = [p for p in paths if schema_for(p)]
+    # compile once here, so workers only read the cache
+    for schema_name in {schema_for(p) for p in paths}:
+        compiled(schema_name)
+    if len(paths) < PARALLEL_MIN or workers == 1:
+        results = list(map(check_file, paths))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers) as pool:
+            chunksize = max(1, len(paths) // (4 * workers))
+            results = list(pool.map(check_file, paths, chunksize=chunksize))
+    return {path: errors for path, errors in zip(paths, results) if errors}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("files", nargs="*", help="Files to check")
+    parser.add_argument("--workers", type=int, help="Worker processes")
+
+    args = parser.parse_args()
+    unmatched = [path for path in args.files if not schema_for(path)]
+    for path in unmatched:
+        print(f"{path}: no schema is for this file")
+    errors = check_files(args.files or course_files(), args.workers)
+    for path, found in sorted(errors.items()):
+        for pointer, message in found:
+            print(f"{path}#{pointer} {message}")
+    if errors or unmatched:
+        sys.exit(1)
+    print("All JSON files match their schemas!")